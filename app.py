@@ -1,15 +1,27 @@
-from flask import Flask, render_template, request, send_file
+from flask import Flask, render_template, request, jsonify, Response
 import os
-import re
-import time
-import json
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from extractor import extract_product, extract_search_cards, RULES
+from fetcher import Fetcher, USER_AGENTS
+from pacing import Pacing, BlockedError
+from output import job_key, claim_job, release_job, open_job
+from store import Store
+from images import ImageDownloader
+from export import ExportError, send_export
+from page_cache import PageCache
+from urls import clean_amazon_url, extract_asin
+from seen import FRESH_HOURS, SeenProducts, describe_skips
+from jobs import JobManager, QueueFullError, JOBS_DIR
+from metrics import Metrics, REGISTRY, bind_job, span, incr, observe, instrument_driver
+from browser import apply_profile, prepare_driver, reset_page_metrics, page_metrics, PageStats, DriverPool, chromedriver_path
 
 app = Flask(__name__)
 
@@ -19,309 +31,518 @@ from datetime import datetime
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 filename = os.path.join(BASE_DIR, "amazon_product_details.json")
 
-def init_driver():
+# Product pages are fanned out over this many worker drivers by default
+DEFAULT_WORKERS = 3
+# Upper bound on product pages loaded at once from a single host, across all jobs
+MAX_CONCURRENCY_PER_HOST = 4
+# Concurrent plain-HTTP product fetches tried before falling back to the browser
+HTTP_CONCURRENCY = 8
+# A product fetched over plain HTTP is only kept if all of these fields were found
+HTTP_REQUIRED_FIELDS = ["Title", "Price", "Product_Information"]
+# How long (seconds) a cached product page is reused by default; 0 disables the cache
+CACHE_TTL = 6 * 60 * 60
+# Driver profile for the product workers ("lean" or "full", see browser.py); the search page always uses "full"
+PRODUCT_PROFILE = "lean"
+
+# "deep" opens every product page, "shallow" keeps what the search result cards show,
+# "hybrid" keeps the card unless it lacks a required field or the ASIN is new
+SEARCH_MODES = ("deep", "shallow", "hybrid")
+# Card fields a hybrid scrape needs before it can skip the product page
+HYBRID_REQUIRED_FIELDS = ["Title", "Price", "Rating"]
+
+# Warm browsers kept per driver profile, and how many to start before the first job
+DRIVER_POOL_SIZE = MAX_CONCURRENCY_PER_HOST
+WARM_SESSIONS = 2
+
+host_slots = {}
+host_slots_lock = threading.Lock()
+
+driver_pools = {}
+driver_pools_lock = threading.Lock()
+
+def init_driver(profile="full"):
     options = webdriver.ChromeOptions()
-    USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_1) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.1 Safari/605.1.15",
-    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-]
     options.add_argument(f"user-agent={random.choice(USER_AGENTS)}")
-    options.add_argument("--start-maximized")
+    apply_profile(options, profile)
     options.add_argument('--disable-blink-features=AutomationControlled')
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
     options.add_argument("--lang=en-US,en;q=0.9")
 
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    driver = webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+    instrument_driver(driver)
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    prepare_driver(driver, profile)
 
     return driver
 
 
-def clean_amazon_url(url):
-    return url.split('?')[0] if '?ref=' in url or '/ref=' in url else url
-
-
-
-def scrape_from_landing_page(landing_url, max_pages):
-    driver = init_driver()
-    all_products = []
+# Clicks every visible expander header in one round-trip and returns how many were opened
+EXPAND_ALL_JS = """
+const spans = document.querySelectorAll("div.a-expander-header.a-declarative > span");
+let clicked = 0;
+for (const span of spans) {
+    if (span.offsetParent !== null) {
+        span.click();
+        clicked++;
+    }
+}
+return clicked;
+"""
+
+
+# Sections rendered only once scrolled into view; each entry is satisfied by any of its selectors
+LAZY_SECTIONS = ["#aplus, #productDescription", "#productDetails_feature_div, #detailBullets_feature_div"]
+
+# Scrolls a viewport per animation frame (or per `pause` ms) until every lazy section is in
+# the DOM, or the bottom is reached and the page stops growing, or `timeout` ms pass
+SCROLL_UNTIL_LOADED_JS = """
+const [sections, pause, timeout, done] = arguments;
+const started = performance.now();
+let lastHeight = 0, stableSteps = 0, steps = 0;
+function next() { pause > 0 ? setTimeout(step, pause) : requestAnimationFrame(step); }
+function step() {
+    steps++;
+    if (sections.every(selector => document.querySelector(selector))) return done({reason: "sections", steps});
+    if (performance.now() - started > timeout) return done({reason: "timeout", steps});
+    const height = document.documentElement.scrollHeight;
+    const atBottom = window.scrollY + window.innerHeight >= height - 2;
+    stableSteps = atBottom && height === lastHeight ? stableSteps + 1 : 0;
+    if (stableSteps >= 10) return done({reason: "settled", steps});
+    lastHeight = height;
+    window.scrollBy(0, window.innerHeight);
+    next();
+}
+step();
+"""
+
+
+def expand_dynamic_sections(driver, pacing):
+    # Step 1: One script scrolls the page and waits, in the browser, for the lazy sections to render
+    with span("scroll"):
+        try:
+            result = driver.execute_async_script(SCROLL_UNTIL_LOADED_JS, LAZY_SECTIONS,
+                                                 pacing.scroll_pause * 1000, pacing.scroll_timeout * 1000)
+            incr("scraper_scroll_total", result=result["reason"])
+        except Exception as e:
+            # The extractor still gets whatever rendered; the missing fields show up in the field stats
+            incr("scraper_errors_total", stage="scroll")
+            print(f"[!] Scroll error: {e}")
 
+    # Step 2: Expand all expander sections; the content is already in the DOM, so no settle time is needed
+    with span("expand"):
+        try:
+            clicked = driver.execute_script(EXPAND_ALL_JS)
+            if clicked:
+                print(f"[+] Clicked {clicked} expander spans")
+        except Exception as e:
+            incr("scraper_errors_total", stage="expand")
+            print(f"[!] Expander click error: {e}")
+
+
+def get_driver_pool(profile):
+    with driver_pools_lock:
+        if profile not in driver_pools:
+            driver_pools[profile] = DriverPool(lambda slot: init_driver(profile), DRIVER_POOL_SIZE)
+        return driver_pools[profile]
+
+
+def host_slot(url):
+    host = urlparse(url).netloc
+    with host_slots_lock:
+        if host not in host_slots:
+            host_slots[host] = threading.BoundedSemaphore(MAX_CONCURRENCY_PER_HOST)
+        return host_slots[host]
+
+
+def scrape_product(driver, product_url, pacing, cache=None, page_stats=None):
+    commands_before = driver.command_count
+    with span("wait"):
+        pacing.wait_turn(product_url)
+    with span("navigate"):
+        reset_page_metrics(driver)
+        driver.get(product_url)
+    with span("wait"):
+        pacing.wait_until_loaded(driver)
+    if page_stats is not None:
+        page_stats.record(*page_metrics(driver))
+
+    # Load lazy sections and open the expanders, then parse the page in one pass
+    expand_dynamic_sections(driver, pacing)
+    with span("extract"):
+        html = driver.page_source
+        product = extract_product(html, product_url)
+    if cache is not None:
+        cache.put(product_url, html)
+
+    observe("scraper_webdriver_commands_per_product", driver.command_count - commands_before)
+    return product
+
+
+def has_required_fields(product):
+    return all(product.get(field, "N/A") != "N/A" for field in HTTP_REQUIRED_FIELDS)
+
+
+def fetch_products_over_http(fetcher, product_urls, cache=None):
+    """Try every product over plain HTTP first. Returns one record per URL, or
+    None where the page was blocked or missing fields and needs the browser."""
+    products = []
+    with span("fetch"):
+        results = fetcher.fetch_all(product_urls)
+    for idx, result in enumerate(results):
+        product = None
+        if result.ok:
+            with span("extract"):
+                product = extract_product(result.html, result.url)
+            if has_required_fields(product):
+                incr("scraper_products_total", source="http")
+                print(f"⚡ Fetched {idx + 1} over HTTP: {product['Title'][:50]}")
+                if cache is not None:
+                    cache.put(result.url, result.html)
+            else:
+                incr("scraper_http_escalations_total", reason="missing_fields")
+                product = None
+        else:
+            incr("scraper_http_escalations_total", reason="blocked" if result.blocked else "error")
+        products.append(product)
+    return products
+
+
+def load_cached_products(cache, product_urls):
+    """Products whose page is in the cache, parsed without navigating; None for misses."""
+    products = []
+    for product_url in product_urls:
+        html = cache.get(product_url) if cache is not None else None
+        if html is None:
+            products.append(None)
+            continue
+        with span("extract"):
+            products.append(extract_product(html, product_url))
+        incr("scraper_products_total", source="cache")
+    return products
+
+
+def scrape_products(product_urls, fetcher, workers, cache=None):
+    """Yield (url, product) in search page order as soon as each product and every
+    one before it is done. Failed products come back as None."""
+    products = load_cached_products(cache, product_urls)
+
+    # Fetch cache misses over plain HTTP first
+    missing = [idx for idx, product in enumerate(products) if product is None]
+    if fetcher and missing:
+        for idx, product in zip(missing, fetch_products_over_http(fetcher, [product_urls[idx] for idx in missing], cache)):
+            products[idx] = product
+
+    # Escalate whatever plain HTTP couldn't handle to the browser workers
+    escalated = [idx for idx, product in enumerate(products) if product is None]
+    if escalated:
+        print(f"🌐 Loading {len(escalated)} products in the browser")
+    browser_results = workers.scrape([product_urls[idx] for idx in escalated])
+
+    escalated = set(escalated)
+    for idx, product_url in enumerate(product_urls):
+        if idx in escalated:
+            # Browser results arrive in the order they were handed out
+            products[idx] = next(browser_results)
+        yield product_url, products[idx]
+
+
+def card_record(card):
+    # The URL goes to the database next to the record, like for full products
+    return {field: value for field, value in card.items() if field != "URL"}
+
+
+def harvest_cards(cards, mode, fetcher, workers, cache, known_asins=(), required_fields=HYBRID_REQUIRED_FIELDS):
+    """Yield (url, record) for search result cards in page order. Shallow mode
+    keeps the cards as they are. Hybrid mode also opens the product page of
+    cards missing one of ``required_fields`` or whose ASIN ``known_asins``
+    doesn't hold, and lays its fields over the card."""
+    to_open = []
+    if mode == "hybrid":
+        to_open = [card["URL"] for card in cards
+                   if card["ASIN"] not in known_asins or any(card.get(field, "N/A") == "N/A" for field in required_fields)]
+        print(f"🃏 {len(cards) - len(to_open)} products complete on their cards, opening {len(to_open)}")
+    products = dict(scrape_products(to_open, fetcher, workers, cache)) if to_open else {}
+
+    for card in cards:
+        record = card_record(card)
+        product = products.get(card["URL"])
+        if product is None:
+            # Shallow, complete enough, or the product page failed: the card is still worth keeping
+            incr("scraper_products_total", source="card")
+        else:
+            record.update((field, value) for field, value in product.items() if value != "N/A")
+        yield card["URL"], record
+
+
+class ProductWorkers:
+    """Scrapes product pages in parallel, each worker thread driving its own
+    browser leased from the warm pool for the profile. A crashed browser goes
+    back to the pool as broken and the worker leases another one for its next
+    product instead of failing the job."""
+
+    def __init__(self, size, pacing, cache=None, profile=PRODUCT_PROFILE, job_metrics=None):
+        self.size = max(1, min(size, MAX_CONCURRENCY_PER_HOST))
+        self.job_metrics = job_metrics
+        self.pacing = pacing
+        self.cache = cache
+        self.profile = profile
+        self.pool = get_driver_pool(profile)
+        self.page_stats = PageStats(profile)
+        self.executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="product-worker")
+        self.local = threading.local()
+        self.drivers = []
+        self.lock = threading.Lock()
+
+    def _driver(self):
+        driver = getattr(self.local, "driver", None)
+        if driver is None:
+            driver = self.pool.acquire()
+            self.local.driver = driver
+            with self.lock:
+                self.drivers.append(driver)
+        return driver
+
+    def _discard_if_dead(self):
+        driver = getattr(self.local, "driver", None)
+        if driver is None:
+            return
+        try:
+            driver.current_url
+        except Exception:
+            print("♻️ Worker browser died, leasing a new one for the next product")
+            self.local.driver = None
+            with self.lock:
+                self.drivers.remove(driver)
+            self.pool.release(driver, broken=True)
+
+    def _scrape(self, idx, product_url):
+        bind_job(self.job_metrics)
+        try:
+            driver = self._driver()
+            with host_slot(product_url):
+                product = scrape_product(driver, product_url, self.pacing, self.cache, self.page_stats)
+            self.pacing.success(product_url)
+            incr("scraper_products_total", source="browser")
+            print(f"✅ Scraped {idx + 1}: {product['Title'][:50]}")
+            return product
+        except BlockedError as e:
+            incr("scraper_product_errors_total", error="BlockedError")
+            print(f"🚫 Blocked on product {idx + 1}: {e}")
+            # Raises once the host keeps blocking, which stops the whole job
+            self.pacing.backoff(product_url)
+            return None
+        except Exception as e:
+            incr("scraper_product_errors_total", error=type(e).__name__)
+            print(f"❌ Error scraping product: {e}")
+            self._discard_if_dead()
+            return None
+
+    def scrape(self, product_urls):
+        # map() yields lazily in submission order, so results keep the search page order.
+        # Products that failed are None.
+        return self.executor.map(self._scrape, range(len(product_urls)), product_urls)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        print(f"📊 Browser pages: {self.page_stats.summary()}")
+        with self.lock:
+            drivers, self.drivers = self.drivers, []
+        for driver in drivers:
+            self.pool.release(driver)
+
+
+def search_results_present(driver):
+    return driver.find_elements(By.CSS_SELECTOR, "a.a-link-normal.s-no-outline")
+
+
+def scrape_from_landing_page(landing_url, max_pages, worker_count=DEFAULT_WORKERS, http_first=True, pacing=None,
+                             cache_ttl=CACHE_TTL, output_path=filename, progress=None, profile=PRODUCT_PROFILE,
+                             job_metrics=None, download_images=False, thumbnails=False, mode="deep",
+                             required_fields=HYBRID_REQUIRED_FIELDS, fresh_hours=FRESH_HOURS):
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}, expected one of {', '.join(SEARCH_MODES)}")
+    pacing = pacing or Pacing()
+    # Stage timings and counters for this job, on top of the process-wide /metrics
+    job_metrics = job_metrics or Metrics()
+    bind_job(job_metrics)
+    # Product pages fetched within cache_ttl seconds are parsed from disk instead of loaded again
+    cache = PageCache(ttl=cache_ttl) if cache_ttl else None
+    landing_url = clean_amazon_url(landing_url)
+
+    # Records stream to output/<job>.jsonl; a rerun with the same parameters picks up from the checkpoint
+    key = job_key("products", landing_url, max_pages, *([mode] if mode != "deep" else []))
+    # One job at a time per key: another writer would truncate this one's output and share its run
+    claim_job(key)
     try:
-        print("Waiting for login if needed...")
-        landing_url = clean_amazon_url(landing_url)
-        driver.get(landing_url)
-        time.sleep(random.uniform(3, 7))  # wait for login
-
-        page = 1
-        while page <= max_pages:
-            try:
-                print(f"\n🔎 Scraping page {page}...")
-
-                WebDriverWait(driver, 15).until(
-                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a.a-link-normal.s-no-outline"))
-                )
-
-                product_links = driver.find_elements(By.CSS_SELECTOR, "a.a-link-normal.s-no-outline")
-                product_urls = [link.get_attribute("href") for link in product_links if link.get_attribute("href")]
-                print(f"🧮 Found {len(product_urls)} products on page {page}")
-
-                for idx, product_url in enumerate(product_urls):
-                    try:
-                        driver.execute_script("window.open('');")
-                        driver.switch_to.window(driver.window_handles[1])
-                        driver.get(product_url)
-                        time.sleep(random.uniform(3, 6))
-
-                        # Extracting Title of the product
-                        try:
-                            title = driver.find_element(By.ID, "productTitle").text.strip()
-                        except:
-                            title = "N/A"
+        writer, checkpoint = open_job(key)
+        # Every product also lands in the results database, which the JSON download is exported from
+        store = Store()
+        run_id = store.start_run("products", key, resume=checkpoint.resumed, keep=writer.count)
+        # Products of this job (including pages saved before a restart) and, with fresh_hours, of recent runs
+        seen = SeenProducts(store, run_id if checkpoint.resumed else None, fresh_hours)
+
+        search_pool = get_driver_pool("full")
+        driver = search_pool.acquire()
+        workers = ProductWorkers(worker_count, pacing, cache, profile, job_metrics)
+        fetcher = Fetcher(USER_AGENTS, concurrency=HTTP_CONCURRENCY, per_host=MAX_CONCURRENCY_PER_HOST, pacing=pacing) if http_first else None
+        # Optional image stage: A+ images stored once each on disk, listed under Image_Files
+        downloader = ImageDownloader(thumbnails=thumbnails) if download_images else None
+        finished = False
 
-                        # Extracting Price of the product
-                        try:
-                            price = driver.find_element(By.CSS_SELECTOR, "span.a-price-whole").text.strip()
-                        except:
-                            price = "N/A"
-
-
-                        # Extracting About this item section
+        try:
+            print("Waiting for login if needed...")
+            with span("navigate"):
+                driver.get(checkpoint.page_url or landing_url)
+            with span("wait"):
+                pacing.wait_for_login(driver, search_results_present)
+
+            page = checkpoint.page
+            while page <= max_pages:
+                try:
+                    print(f"\n🔎 Scraping page {page}...")
+
+                    with span("wait"):
+                        pacing.wait_for(driver, search_results_present)
+                    checkpoint.start_page(page, driver.current_url)
+
+                    product_links = driver.find_elements(By.CSS_SELECTOR, "a.a-link-normal.s-no-outline")
+                    # Pagination waits for the first link's href to change, so keep it exactly as the browser
+                    # reports it (card URLs below are canonical and would never match)
+                    first_link = product_links[0].get_attribute("href") if product_links else ""
+                    if mode == "deep":
+                        product_urls = [link.get_attribute("href") for link in product_links if link.get_attribute("href")]
+                    else:
+                        # The whole page in one round-trip; every card is parsed offline
+                        with span("extract"):
+                            cards = extract_search_cards(driver.page_source, driver.current_url)
+                        product_urls = [card["URL"] for card in cards]
+                    print(f"🧮 Found {len(product_urls)} products on page {page}")
+
+                    # Sponsored, variant and repeated links collapse into one /dp/ASIN URL each
+                    product_urls, skipped = seen.filter(product_urls)
+                    if any(skipped.values()):
+                        print(f"⏭️ Skipping {describe_skips(skipped)}")
+                    pending = [url for url in product_urls if url not in checkpoint.done]
+                    if len(pending) < len(product_urls):
+                        print(f"⏭️ Skipping {len(product_urls) - len(pending)} products saved before the restart")
+
+                    if mode == "deep":
+                        scraped = scrape_products(pending, fetcher, workers, cache)
+                    else:
+                        # The first card of a repeated product wins, as its link did
+                        cards_by_url = {card["URL"]: card for card in reversed(cards)}
+                        pending_cards = [cards_by_url[url] for url in pending]
+                        known_asins = store.known_asins(card["ASIN"] for card in pending_cards) if mode == "hybrid" else ()
+                        scraped = harvest_cards(pending_cards, mode, fetcher, workers, cache, known_asins, required_fields)
+                    if downloader is not None:
+                        # A whole page's images go in one batch, so shared banners and connections are reused
+                        scraped = downloader.attach(list(scraped))
+
+                    rows = []
+                    for product_url, product in scraped:
+                        if product is not None:
+                            with span("write"):
+                                rows.append((writer.count, product_url, product))
+                                writer.write(product)
+                            seen.add(extract_asin(product_url))
+                            if progress:
+                                progress(page - 1, writer.count)
+                    # The page goes to the store in one transaction. Only then does the checkpoint count it,
+                    # so a restart cuts the JSONL back to what the store holds
+                    with span("write"):
+                        store.add_products(run_id, rows)
+                        checkpoint.record_written(writer, [product_url for _, product_url, _ in rows])
+
+                    # Go to next page if not the last one
+                    if page < max_pages:
                         try:
-                            raw_about = driver.find_element(By.ID, "feature-bullets").text.strip()
-                            about_lines = raw_about.splitlines()
-
-                            # Remove "About this item" if it's the first line
-                            if about_lines and "about this item" in about_lines[0].lower():
-                                about_lines.pop(0)
-
-                            # Remove "› See more product details" if it's the last line
-                            if about_lines and "see more product details" in about_lines[-1].lower():
-                                about_lines.pop()
-
-                            about = "\n".join(about_lines).strip()
+                            with span("paginate"):
+                                old_first = first_link
+
+                                next_btn = pacing.wait_for(driver, EC.element_to_be_clickable((By.CSS_SELECTOR, "a.s-pagination-next")))
+                                driver.execute_script("arguments[0].scrollIntoView();", next_btn)
+                                pacing.wait_turn(driver.current_url)
+                                driver.execute_script("arguments[0].click();", next_btn)
+                                print(f"➡️ Clicked to go to page {page + 1}")
+
+                                pacing.wait_for(driver, lambda d: (
+                                    d.find_elements(By.CSS_SELECTOR, "a.a-link-normal.s-no-outline") and
+                                    d.find_elements(By.CSS_SELECTOR, "a.a-link-normal.s-no-outline")[0].get_attribute("href") != old_first
+                                ))
+
+                                print(f"🔄 Loaded page {page + 1} successfully")
+                        except BlockedError:
+                            raise
+                        except Exception as e:
+                            print("⛔ Pagination failed or no more pages:", e)
+                            finished = True
+                            break
+
+                    if progress:
+                        progress(page, writer.count)
+
+                    # This is the important part — must be outside pagination block
+                    page += 1
+
+                except BlockedError as e:
+                    print(f"🚫 Stopping job, the site is blocking us: {e}")
+                    break
+                except Exception as e:
+                    print(f"⚠️ Error on page {page}: {e}")
+                    break
+            else:
+                finished = True
+        finally:
+            workers.close()
+            search_pool.release(driver)
+            writer.close()
+            if cache is not None:
+                stats = cache.stats()
+                print(f"📦 Page cache: {stats['hits']} hits, {stats['misses']} misses")
+            if any(seen.skipped.values()):
+                print(f"⏭️ Products not opened: {describe_skips(seen.skipped)}")
+            if downloader is not None:
+                print(f"🖼️ Images: {downloader.summary()}")
+                downloader.store.close()
+            print(f"⏱️ Job stages: {job_metrics.summary()['stages']}")
+            # What the field rules learned about this site's layouts carries over to the next job
+            RULES.save_stats()
+            # Only a run that got through every page clears the checkpoint; otherwise the next run resumes
+            if finished:
+                checkpoint.finish()
+                store.finish_run(run_id)
+            store.export_json(run_id, output_path)
+            store.close()
+    finally:
+        release_job(key)
 
-                            # If still empty after cleaning, try fallback for books
-                            if not about:
-                                raise Exception("Empty after cleaning, try book fallback")
+    return output_path
 
-                        except:
-                            # Fallback for books (like in bookDescription_feature_div)
-                            try:
-                                book_desc_div = driver.find_element(By.ID, "bookDescription_feature_div")
-                                book_span = book_desc_div.find_element(By.TAG_NAME, "span")
-                                about = book_span.text.strip()
-                            except:
-                                about = "N/A"
 
 
+def run_job(job):
+    scrape_from_landing_page(
+        job.params["landing_url"], job.params["pages"], job.params["workers"],
+        pacing=Pacing(**job.params.get("pacing", {})), cache_ttl=job.params.get("cache_ttl", CACHE_TTL),
+        output_path=job.output_path, progress=job.progress, job_metrics=job.metrics,
+        download_images=job.params.get("images", False), thumbnails=job.params.get("thumbnails", False),
+        mode=job.params.get("mode", "deep"), required_fields=job.params.get("fields", HYBRID_REQUIRED_FIELDS),
+        fresh_hours=job.params.get("fresh_hours", FRESH_HOURS),
+    )
 
-                        # Extracting Product Information / Product Details
-                        try:
-                            product_info = "N/A"  # Default fallback
-
-                            # Step 1: Slowly scroll down to load all dynamic content
-                            scroll_height = driver.execute_script("return document.body.scrollHeight")
-                            for y in range(0, scroll_height, 300):
-                                driver.execute_script(f"window.scrollTo(0, {y});")
-                                time.sleep(0.3)
-
-                            # Step 2: Expand all expander buttons (reliable span click)
-                            try:
-                                expander_spans = driver.find_elements(
-                                    By.XPATH, "//div[contains(@class, 'a-expander-header') and contains(@class, 'a-declarative')]/span"
-                                )
-                                for span in expander_spans:
-                                    try:
-                                        if span.is_displayed():
-                                            driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", span)
-                                            time.sleep(0.5)
-                                            driver.execute_script("arguments[0].click();", span)
-                                            time.sleep(1)
-                                            print("[+] Clicked expander span")
-                                    except Exception as e:
-                                        print(f"[!] Expander click error: {e}")
-                                        continue
-                            except Exception as e:
-                                print(f"[!] Expander span fetch error: {e}")
-
-                            # Step 3: Extract key-value table pairs
-                            try:
-                                table_rows = driver.find_elements(By.XPATH, "//table[contains(@class, 'a-keyvalue')]//tr")
-
-                                pairs = []
-                                for row in table_rows:
-                                    try:
-                                        key = row.find_element(By.XPATH, ".//th").text.strip()
-                                        value = row.find_element(By.XPATH, ".//td").text.strip()
-                                        if key and value:
-                                            pairs.append(f"{key}: {value}")
-                                    except Exception as e:
-                                        print(f"[Row Parse Error] {e}")
-                                        continue
-
-                                if pairs:
-                                    product_info = "\n".join(pairs)
-                                else:
-                                    raise Exception("No product info found in key-value table.")
-
-                            except Exception as e:
-                                print(f"[Expandable Section Error] {e}")
-
-                                # Fallback 1: Try normal Product Information block
-                                try:
-                                    product_info_element = driver.find_element(By.XPATH, "//div[@id='productDetails_feature_div']")
-                                    raw_info = product_info_element.text.strip()
-                                    lines = raw_info.splitlines()
-                                    filtered_lines = [
-                                        line for line in lines
-                                        if line.strip().lower() not in [
-                                            "product information",
-                                            "feedback",
-                                            "would you like to tell us about a lower price?"
-                                        ]
-                                    ]
-                                    if filtered_lines:
-                                        product_info = "\n".join(filtered_lines).strip()
-                                    else:
-                                        raise Exception("Empty product info block.")
-
-                                except Exception as e:
-                                    print(f"[Fallback 1 Error] {e}")
-
-                                    # Fallback 2: Try detail bullets
-                                    try:
-                                        detail_element = driver.find_element(By.ID, "detailBullets_feature_div")
-                                        raw_detail = detail_element.text.strip()
-                                        detail_lines = raw_detail.splitlines()
-                                        filtered_detail_lines = [
-                                            line for line in detail_lines
-                                            if line.strip().lower() not in [
-                                                "product details",
-                                                "feedback",
-                                                "would you like to tell us about a lower price?"
-                                            ]
-                                        ]
-                                        if filtered_detail_lines:
-                                            product_info = "\n".join(filtered_detail_lines).strip()
-                                    except Exception as e:
-                                        print(f"[Fallback 2 Error] {e}")
-                                        product_info = "N/A"
 
-                        except Exception as e:
-                            print(f"[Main Block Error] {e}")
-                            product_info = "N/A"
+jobs = JobManager("products", run_job, "amazon_product_details")
 
 
+def wants_json():
+    return request.accept_mimetypes.best_match(["application/json", "text/html"]) == "application/json"
 
 
-
-                        # Extracting Product Description
-                        try:
-                            aplus_html = ""
-                            cleaned_text = ""
-                            unique_images = []
-
-                            try:
-                                aplus_element = driver.find_element(By.ID, "aplus")
-                                aplus_html = aplus_element.get_attribute("innerHTML")
-                                text_content = aplus_element.text.strip()
-
-                                # Remove unwanted sections like "From the Brand", "Click to play video"
-                                cleaned_lines = []
-                                skip_section = False
-                                for line in text_content.splitlines():
-                                    lower_line = line.strip().lower()
-                                    if "from the brand" in lower_line or "click to play video" in lower_line:
-                                        skip_section = True
-                                    elif skip_section and lower_line == "":
-                                        skip_section = False
-                                    elif not skip_section and lower_line not in ["product description"]:
-                                        cleaned_lines.append(line.strip())
-
-                                cleaned_text = "\n".join(cleaned_lines).strip()
-
-                                # Unique image URLs
-                                image_tags = re.findall(r'<img[^>]+src="([^">]+)"', aplus_html)
-                                unique_images = list(dict.fromkeys(image_tags))
-
-                            except:
-                                # Fallback to basic product description
-                                try:
-                                    basic_desc_element = driver.find_element(By.ID, "productDescription")
-                                    cleaned_text = basic_desc_element.text.strip()
-                                except:
-                                    cleaned_text = "N/A"
-
-                            desc = {
-                                "text": cleaned_text if cleaned_text else "N/A",
-                                "images": unique_images,
-                            }
-
-                        except Exception as e:
-                            print("Could not extract product description:", e)
-                            desc = {
-                                "text": "N/A",
-                                "images": [],
-                            }
-
-
-                        all_products.append({
-                            "Title": title,
-                            "Price": price,
-                            "About_this_Item": about,
-                            "Product_Information": product_info,
-                            "Product_Description": desc
-                        })
-
-                        print(f"✅ Scraped {idx + 1}: {title[:50]}")
-
-                        driver.close()
-                        driver.switch_to.window(driver.window_handles[0])
-                    except Exception as e:
-                        print(f"❌ Error scraping product: {e}")
-                        driver.close()
-                        driver.switch_to.window(driver.window_handles[0])
-                        continue
-
-                # Go to next page if not the last one
-                if page < max_pages:
-                    try:
-                        old_first = product_urls[0] if product_urls else ""
-
-                        next_btn = WebDriverWait(driver, 10).until(
-                            EC.element_to_be_clickable((By.CSS_SELECTOR, "a.s-pagination-next"))
-                        )
-                        driver.execute_script("arguments[0].scrollIntoView();", next_btn)
-                        time.sleep(random.uniform(2, 4))
-                        driver.execute_script("arguments[0].click();", next_btn)
-                        print(f"➡️ Clicked to go to page {page + 1}")
-
-                        WebDriverWait(driver, 15).until(lambda d: (
-                            d.find_elements(By.CSS_SELECTOR, "a.a-link-normal.s-no-outline") and
-                            d.find_elements(By.CSS_SELECTOR, "a.a-link-normal.s-no-outline")[0].get_attribute("href") != old_first
-                        ))
-
-                        print(f"🔄 Loaded page {page + 1} successfully")
-                        time.sleep(random.uniform(2, 4))
-                    except Exception as e:
-                        print("⛔ Pagination failed or no more pages:", e)
-                        break
-
-                # This is the important part — must be outside pagination block
-                page += 1
-
-            except Exception as e:
-                print(f"⚠️ Error on page {page}: {e}")
-                break
-    finally:
-        driver.quit()
-        with open(filename, mode="w", encoding="utf-8") as output_file:
-            json.dump(all_products, output_file, ensure_ascii=False, indent=4)
-
-    return filename
-
+def form_error(message):
+    if wants_json():
+        return jsonify({"error": message}), 400
+    return render_template("index.html", error=message)
 
 
 @app.route('/', methods=['GET', 'POST'])
@@ -329,28 +550,86 @@ def index():
     if request.method == 'POST':
         landing_url = request.form.get('product_url')
         pages = int(request.form.get('pages', 1))
+        worker_count = int(request.form.get('workers', DEFAULT_WORKERS))
+        download_images = request.form.get('images') in ('1', 'true', 'on')
+        thumbnails = request.form.get('thumbnails') in ('1', 'true', 'on')
+        mode = request.form.get('mode', 'deep')
+        # Comma-separated card fields a hybrid scrape must find before skipping the product page
+        required_fields = [field.strip() for field in request.form.get('fields', '').split(',') if field.strip()]
+        # Skip products an earlier run scraped within this many hours
+        fresh_hours = float(request.form.get('fresh_hours', FRESH_HOURS))
 
         if not landing_url:
             return render_template("index.html", error="Please enter a valid Amazon landing page URL")
+        if mode not in SEARCH_MODES:
+            return form_error(f"Mode must be one of {', '.join(SEARCH_MODES)}")
+        try:
+            # Per-job overrides of any of Pacing.DEFAULTS
+            pacing_settings = Pacing.parse_settings(request.form)
+        except ValueError as e:
+            return form_error(str(e))
+        # Seconds a cached product page stays usable; 0 skips the cache
+        cache_ttl = request.form.get('cache_ttl') or str(CACHE_TTL)
+        if not cache_ttl.isdecimal():
+            return form_error("cache_ttl must be a whole number of seconds")
 
         try:
-            json_filename = scrape_from_landing_page(landing_url, pages)
-            return render_template("index.html", download_ready=True, filename=os.path.basename(json_filename))
-        except Exception as e:
-            return render_template("index.html", error=f"An error occurred: {str(e)}")
+            # The scrape runs in the background; the page polls the job until its file is ready
+            job = jobs.submit(landing_url=clean_amazon_url(landing_url), pages=pages, workers=worker_count,
+                              images=download_images or thumbnails, thumbnails=thumbnails, mode=mode,
+                              fields=required_fields or HYBRID_REQUIRED_FIELDS, fresh_hours=fresh_hours,
+                              pacing=pacing_settings, cache_ttl=int(cache_ttl))
+        except QueueFullError as e:
+            if wants_json():
+                return jsonify({"error": str(e)}), 503
+            return render_template("index.html", error=str(e))
+
+        if wants_json():
+            return jsonify(job.to_dict()), 202
+        return render_template("index.html", job_id=job.id)
 
     return render_template("index.html")
 
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/progress')
+def job_progress(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"status": job.status, "pages_done": job.pages_done, "items_done": job.items_done})
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    path = os.path.join(BASE_DIR, filename)
-    if os.path.exists(path):
-        return send_file(path, as_attachment=True)
-    else:
-        return "File not found", 404
+    filename = os.path.basename(filename)
+    for directory in (JOBS_DIR, BASE_DIR):
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            try:
+                # ?format=jsonl.gz, csv or parquet converts the JSON output on first request
+                return send_export(path, request.args.get('format', 'json'))
+            except ExportError as e:
+                return str(e), 400
+    return "File not found", 404
 
 
 if __name__ == "__main__":
+    # Start browsers ahead of the first job so it doesn't pay for Chrome startup
+    # (only in the process that serves requests, not the debug reloader's parent)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        get_driver_pool("full").warm(1)
+        get_driver_pool(PRODUCT_PROFILE).warm(WARM_SESSIONS)
     app.run(debug=True)
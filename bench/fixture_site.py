@@ -0,0 +1,116 @@
+import os
+import re
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# /<slug>/dp/<ASIN>/ref=... and /product-reviews/<ASIN>/ref=..., the way Amazon links them
+PRODUCT_PATH = re.compile(r"/dp/([A-Z0-9]{10})(?:/|$)")
+REVIEWS_PATH = re.compile(r"^/product-reviews/([A-Z0-9]{10})(?:/|$)")
+
+# Served for review pages past the last recorded one, like Amazon does
+EMPTY_REVIEWS_PAGE = """<!doctype html>
+<html lang="en-in"><head><meta charset="utf-8"><title>Amazon.in:Customer reviews</title></head>
+<body><div id="cm_cr-review_list"><span class="a-size-medium">No more reviews</span></div></body></html>
+"""
+
+
+def fixture_path(path, query):
+    """The recorded page for a request path, or None for a 404."""
+    if path == "/s":
+        page = query.get("page", ["1"])[0]
+        return os.path.join(FIXTURES_DIR, "search", f"page{page}.html")
+
+    reviews_match = REVIEWS_PATH.match(path)
+    if reviews_match:
+        page = query.get("pageNumber", ["1"])[0]
+        return os.path.join(FIXTURES_DIR, "reviews", reviews_match.group(1), f"page{page}.html")
+
+    product_match = PRODUCT_PATH.search(path)
+    if product_match:
+        return os.path.join(FIXTURES_DIR, "dp", f"{product_match.group(1)}.html")
+    return None
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real site, so the HTTP fetcher's connection pool is exercised
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = fixture_path(url.path, parse_qs(url.query))
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if path is not None and os.path.exists(path):
+            with open(path, mode="rb") as fixture_file:
+                self.send_page(200, fixture_file.read())
+        elif REVIEWS_PATH.match(url.path):
+            self.send_page(200, EMPTY_REVIEWS_PAGE.encode("utf-8"))
+        else:
+            self.send_page(404, b"<html><body>Not found</body></html>")
+
+    def send_page(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.requests += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureSite:
+    """Serves the recorded search, product and review pages on localhost.
+    ``latency`` (seconds) is added to every response to stand in for the network."""
+
+    def __init__(self, port=0, latency=0.0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.requests = 0
+        self.server.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fixture-site", daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # Browse the fixtures by hand: python bench/fixture_site.py [port]
+    import sys
+
+    site = FixtureSite(int(sys.argv[1]) if len(sys.argv) > 1 else 8765).start()
+    print(f"🧪 Serving fixtures on {site.base_url}/s?k=globe (Ctrl+C to stop)")
+    try:
+        site.thread.join()
+    except KeyboardInterrupt:
+        site.stop()
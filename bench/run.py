@@ -0,0 +1,287 @@
+"""Offline benchmark for the product and review scrapers.
+
+Serves the recorded pages in bench/fixtures on localhost, points
+``scrape_from_landing_page`` and ``scrape_reviews`` at them and reports
+items/minute, WebDriver commands per item, peak RSS (this process plus every
+browser it started) and how many fields match the golden JSON in bench/golden.
+Nothing leaves the machine, so runs are repeatable on a box without a network:
+
+    SCRAPER_HEADLESS=1 CHROMEDRIVER=/usr/bin/chromedriver python bench/run.py
+    python bench/run.py --modes http --latency 0.05 --report before.json
+    python bench/run.py --compare before.json
+    python bench/run.py --update-golden   # after a deliberate extractor change
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+
+import psutil
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import app  # noqa: E402
+import output  # noqa: E402
+import extractor  # noqa: E402
+import store  # noqa: E402
+import product_reviews  # noqa: E402
+from pacing import Pacing  # noqa: E402
+from metrics import Metrics  # noqa: E402
+from fixture_site import FixtureSite  # noqa: E402
+
+
+GOLDEN_DIR = os.path.join(BENCH_DIR, "golden")
+
+# The fixture search has two result pages; reviews are asked for one page more
+# than were recorded so the scrapers have to notice the end on their own
+SEARCH_PAGES = 2
+REVIEW_PAGES = 3
+REVIEW_ASINS = ["B0BENCH001", "B0BENCH002"]
+
+# "http" tries plain HTTP first and escalates to the browser, "browser" loads every page in Chrome
+MODES = ("http", "browser")
+
+# Pacing is about being polite to Amazon; against localhost it would only measure the sleeps
+BENCH_PACING = {"requests_per_second": 1000.0, "burst": 1000, "scroll_pause": 0, "login_wait": 0}
+
+
+class PeakRss:
+    """Samples the resident memory of this process and all of its children
+    (chromedriver and Chrome) in the background, keeping the peak."""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def sample(self):
+        process = psutil.Process()
+        total = 0
+        for member in [process] + process.children(recursive=True):
+            try:
+                total += member.memory_info().rss
+            except psutil.Error:
+                pass
+        self.peak = max(self.peak, total)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+
+    @property
+    def peak_mb(self):
+        return self.peak / (1024 * 1024)
+
+
+def webdriver_commands(job_metrics):
+    return sum(value for (name, _), value in job_metrics.counters.items() if name == "webdriver_commands_total")
+
+
+def compare(records, golden):
+    """Field-by-field match of a run's records against the golden ones, in order."""
+    checked = correct = 0
+    mismatches = []
+    for idx in range(max(len(records), len(golden))):
+        expected = golden[idx] if idx < len(golden) else {}
+        actual = records[idx] if idx < len(records) else {}
+        for field in sorted(expected.keys() | actual.keys()):
+            checked += 1
+            if expected.get(field) == actual.get(field):
+                correct += 1
+            else:
+                mismatches.append(f"#{idx + 1} {field}")
+    return {"fields": checked, "correct": correct, "mismatches": mismatches}
+
+
+def load_golden(name):
+    with open(os.path.join(GOLDEN_DIR, f"{name}.json"), mode="r", encoding="utf-8") as golden_file:
+        return json.load(golden_file)
+
+
+def read_output(path):
+    with open(path, mode="r", encoding="utf-8") as output_file:
+        return json.load(output_file)
+
+
+def run_products(site, mode, workers, workdir, search_mode="deep"):
+    job_metrics = Metrics()
+    output_path = os.path.join(workdir, f"products_{search_mode}_{mode}.json")
+    started = time.perf_counter()
+    app.scrape_from_landing_page(
+        f"{site.base_url}/s?k=globe", SEARCH_PAGES, workers, http_first=(mode == "http"),
+        pacing=Pacing(**BENCH_PACING), cache_ttl=0, output_path=output_path, job_metrics=job_metrics,
+        mode=search_mode,
+    )
+    return read_output(output_path), time.perf_counter() - started, job_metrics
+
+
+def run_reviews(site, mode, workdir):
+    job_metrics = Metrics()
+    output_path = os.path.join(workdir, f"reviews_{mode}.json")
+    started = time.perf_counter()
+    product_reviews.scrape_reviews_batch(
+        REVIEW_ASINS, REVIEW_PAGES, http_first=(mode == "http"), pacing=Pacing(**BENCH_PACING),
+        output_path=output_path, job_metrics=job_metrics,
+    )
+    elapsed = time.perf_counter() - started
+
+    records = {}
+    for review in read_output(output_path):
+        records.setdefault(review.pop("ASIN"), []).append(review)
+    return records, elapsed, job_metrics
+
+
+def score(kind, records, golden):
+    if kind == "reviews":
+        correctness = compare([r for asin in REVIEW_ASINS for r in records.get(asin, [])],
+                              [r for asin in REVIEW_ASINS for r in golden.get(asin, [])])
+    else:
+        correctness = compare(records, golden)
+    return {"fields": correctness["fields"], "fields_correct": correctness["correct"],
+            "mismatches": correctness["mismatches"]}
+
+
+def measure(kind, mode, run, rounds, verbose):
+    """Run a scrape ``rounds`` times and keep the fastest round's numbers."""
+    best = None
+    for _ in range(rounds):
+        with PeakRss() as rss, contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+            records, elapsed, job_metrics = run()
+        if best is None or elapsed < best[1]:
+            best = (records, elapsed, job_metrics, rss.peak_mb)
+
+    records, elapsed, job_metrics, peak_mb = best
+    items = sum(map(len, records.values())) if kind == "reviews" else len(records)
+    return {
+        "kind": kind,
+        "mode": mode,
+        "items": items,
+        "seconds": round(elapsed, 3),
+        "items_per_minute": round(items / elapsed * 60, 1) if elapsed else 0.0,
+        "commands_per_item": round(webdriver_commands(job_metrics) / items, 1) if items else None,
+        "peak_rss_mb": round(peak_mb, 1),
+        "stages": job_metrics.summary()["stages"],
+    }, records
+
+
+def print_report(results, baseline=None):
+    baseline_rates = {(r["kind"], r["mode"]): r["items_per_minute"] for r in (baseline or {}).get("results", [])}
+
+    print(f"\n{'kind':<9} {'mode':<8} {'items':>5} {'seconds':>8} {'items/min':>10} {'cmds/item':>10} "
+          f"{'peak RSS MB':>12} {'correct':>9}")
+    for result in results:
+        line = (f"{result['kind']:<9} {result['mode']:<8} {result['items']:>5} {result['seconds']:>8.2f} "
+                f"{result['items_per_minute']:>10.1f} {str(result['commands_per_item']):>10} "
+                f"{result['peak_rss_mb']:>12.1f} {result['fields_correct']:>4}/{result['fields']:<4}")
+        before = baseline_rates.get((result["kind"], result["mode"]))
+        if before:
+            line += f"  {(result['items_per_minute'] - before) / before * 100:+.1f}% vs baseline"
+        print(line)
+        if result["mismatches"]:
+            print(f"    ❌ differs from golden: {', '.join(result['mismatches'][:10])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against the local fixture site.")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated: http, browser")
+    parser.add_argument("--kinds", default="products,reviews,cards",
+                        help="comma-separated: products, reviews, cards (search result cards only)")
+    parser.add_argument("--workers", type=int, default=app.DEFAULT_WORKERS)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--rounds", type=int, default=1, help="repeat each run and keep the fastest")
+    parser.add_argument("--report", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline report to compare items/min against")
+    parser.add_argument("--update-golden", action="store_true", help="save this run's output as the golden JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the scrapers' own logging")
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    kinds = [kind for kind in args.kinds.split(",") if kind]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"unknown mode {mode!r}")
+
+    golden = {kind: ({} if args.update_golden else load_golden(kind)) for kind in kinds}
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="scraper-bench-") as workdir, FixtureSite(latency=args.latency) as site:
+        product_reviews.REVIEWS_URL = (f"{site.base_url}/product-reviews/{{asin}}/ref=cm_cr_dp_d_show_all_btm"
+                                       "?ie=UTF8&reviewerType=all_reviews")
+        # Results go to a throwaway database instead of the real one
+        store.DB_PATH = os.path.join(workdir, "bench.db")
+        # Field rule hit counts of the bench stay out of the real ones
+        extractor.RULES.stats.clear()
+        extractor.RULES.stats_path = os.path.join(workdir, "field_stats.json")
+        print(f"🧪 Fixture site on {site.base_url}")
+
+        # Browser startup is paid once per process thanks to the pools, so keep it out of the timings
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+            app.get_driver_pool("full").warm(1)
+            if "products" in kinds:
+                app.get_driver_pool(app.PRODUCT_PROFILE).warm(min(args.workers, app.MAX_CONCURRENCY_PER_HOST))
+            if "reviews" in kinds and "browser" in modes:
+                product_reviews.driver_pool.warm(1)
+        print(f"🚀 Browsers warmed in {time.perf_counter() - started:.1f}s")
+
+        try:
+            for kind in kinds:
+                for mode in modes:
+                    # Each run gets its own output directory so checkpoints never carry over
+                    output.OUTPUT_DIR = os.path.join(workdir, f"{kind}_{mode}")
+                    if kind == "products":
+                        run = lambda: run_products(site, mode, args.workers, workdir)  # noqa: E731
+                    elif kind == "cards":
+                        run = lambda: run_products(site, mode, args.workers, workdir, "shallow")  # noqa: E731
+                    else:
+                        run = lambda: run_reviews(site, mode, workdir)  # noqa: E731
+
+                    print(f"⏱️ {kind} / {mode}...")
+                    result, records = measure(kind, mode, run, args.rounds, args.verbose)
+
+                    if args.update_golden and not golden[kind]:
+                        golden[kind] = records
+                        with open(os.path.join(GOLDEN_DIR, f"{kind}.json"), mode="w", encoding="utf-8") as golden_file:
+                            json.dump(records, golden_file, ensure_ascii=False, indent=4)
+                        print(f"💾 Saved {kind} golden JSON from the {mode} run")
+
+                    result.update(score(kind, records, golden[kind]))
+                    results.append(result)
+        finally:
+            for pool in list(app.driver_pools.values()) + [product_reviews.driver_pool]:
+                pool.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, mode="r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(results, baseline)
+
+    if args.report:
+        with open(args.report, mode="w", encoding="utf-8") as report_file:
+            json.dump({"latency": args.latency, "workers": args.workers, "results": results}, report_file, indent=4)
+        print(f"\n📄 Report written to {args.report}")
+
+    # Non-zero exit when any field drifted from the golden JSON, so it can gate a change
+    return 0 if all(result["fields_correct"] == result["fields"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import queue
+import functools
+import threading
+import contextlib
+
+import psutil
+from webdriver_manager.chrome import ChromeDriverManager
+
+
+# "full" is the regular visible, maximized Chrome that loads everything (needed for manual logins).
+# "lean" runs headless, stops waiting at DOMContentLoaded and skips images, fonts, media, ads and analytics.
+PROFILES = ("full", "lean")
+
+# Run the "full" profile headless too, for boxes without a display (e.g. the benchmark in bench/)
+HEADLESS = os.environ.get("SCRAPER_HEADLESS") == "1"
+
+# Chrome's Network.setBlockedURLs patterns for the lean profile. We only read text and
+# <img src> attributes, so none of these are needed.
+BLOCKED_URL_PATTERNS = [
+    # media and fonts
+    "*.mp4*", "*.webm*", "*.m3u8*", "*.ts?*", "*.woff*", "*.woff2*", "*.ttf*", "*.otf*",
+    # ads
+    "*amazon-adsystem.com*", "*aax-*.amazon*", "*doubleclick.net*", "*googlesyndication.com*",
+    # analytics and beacons
+    "*google-analytics.com*", "*googletagmanager.com*", "*fls-*.amazon.*", "*unagi*.amazon.*",
+    "*/uedata*", "*/1/batch/1/OE/*", "*/rd/uedata*",
+]
+
+
+def apply_profile(options, profile):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown driver profile {profile!r}, expected one of {', '.join(PROFILES)}")
+
+    if profile == "lean":
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1366,900")
+        options.page_load_strategy = "eager"
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.notifications": 2,
+        })
+    else:
+        options.add_argument("--start-maximized")
+        if HEADLESS:
+            options.add_argument("--headless=new")
+
+    # Network events feed the bytes-per-page numbers in PageStats
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def prepare_driver(driver, profile):
+    if profile == "lean":
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+
+def reset_page_metrics(driver):
+    # Drain the performance log so the next reading only covers the next page
+    try:
+        driver.get_log("performance")
+    except Exception:
+        pass
+
+
+def page_metrics(driver):
+    """Bytes received since the last reset and the page's load time in ms."""
+    received = 0
+    try:
+        for entry in driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            if message["method"] == "Network.loadingFinished":
+                received += message["params"].get("encodedDataLength", 0)
+    except Exception:
+        received = None
+
+    load_ms = driver.execute_script("""
+        const nav = performance.getEntriesByType("navigation")[0];
+        return nav ? (nav.loadEventEnd || nav.domContentLoadedEventEnd) - nav.startTime : null;
+    """)
+    return received, load_ms
+
+
+class PageStats:
+    """Running totals of bytes and load time per page for a job."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.pages = 0
+        self.bytes = 0
+        self.load_ms = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, received, load_ms):
+        with self.lock:
+            self.pages += 1
+            self.bytes += received or 0
+            self.load_ms += load_ms or 0
+
+    def summary(self):
+        with self.lock:
+            if not self.pages:
+                return f"[{self.profile}] no pages loaded in the browser"
+            return (f"[{self.profile}] {self.pages} pages, {self.bytes / self.pages / 1024:.0f} KB/page, "
+                    f"{self.load_ms / self.pages:.0f} ms load/page")
+
+
+@functools.lru_cache(maxsize=None)
+def chromedriver_path():
+    """Resolve (and download if needed) the chromedriver binary once per process.
+    Set CHROMEDRIVER to a local binary to skip the download on offline boxes."""
+    return os.environ.get("CHROMEDRIVER") or ChromeDriverManager().install()
+
+
+# Hard cap on Chrome instances across every pool in the process
+MAX_BROWSERS = 8
+browser_slots = threading.BoundedSemaphore(MAX_BROWSERS)
+
+
+def browser_rss_mb(driver):
+    """Resident memory of the chromedriver process and every Chrome process under it."""
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+        return sum(process.memory_info().rss for process in processes) / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+
+class Session:
+    def __init__(self, driver, slot):
+        self.driver = driver
+        self.slot = slot
+        self.uses = 0
+
+
+class DriverPool:
+    """Long-lived browsers leased out to jobs instead of started per job.
+
+    ``factory(slot)`` starts a browser; ``slot`` is a small integer that stays
+    with the session (handy for a per-slot Chrome profile directory). Sessions
+    are health-checked when leased, reset when returned, and replaced after
+    ``max_uses`` leases or once they grow past ``max_rss_mb``.
+    """
+
+    def __init__(self, factory, size, max_uses=50, max_rss_mb=1500, clear_cookies=True):
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.clear_cookies = clear_cookies
+        self.idle = queue.LifoQueue()
+        self.free_slots = queue.Queue()
+        for slot in range(size):
+            self.free_slots.put(slot)
+        self.leased = {}
+        self.lock = threading.Lock()
+
+    def _start(self, slot):
+        browser_slots.acquire()
+        try:
+            return Session(self.factory(slot), slot)
+        except Exception:
+            browser_slots.release()
+            self.free_slots.put(slot)
+            raise
+
+    def _destroy(self, session):
+        try:
+            session.driver.quit()
+        except Exception:
+            pass
+        browser_slots.release()
+        self.free_slots.put(session.slot)
+
+    def is_healthy(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def warm(self, count=None):
+        """Start up to ``count`` sessions (default: the pool size) ahead of the first job."""
+        started = []
+        for _ in range(self.size if count is None else count):
+            try:
+                slot = self.free_slots.get_nowait()
+            except queue.Empty:
+                break
+            started.append(self._start(slot))
+        for session in started:
+            self.idle.put(session)
+        return len(started)
+
+    def _next_session(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                return self._start(self.free_slots.get_nowait())
+            except queue.Empty:
+                pass
+            # Poll, since a slot can also free up when a session is destroyed
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("No pooled browser became available")
+            try:
+                return self.idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def acquire(self, timeout=None):
+        """Lease a driver, blocking while every session is in use."""
+        while True:
+            session = self._next_session(timeout)
+            if self.is_healthy(session.driver):
+                break
+            print("♻️ Pooled browser failed its health check, replacing it")
+            self._destroy(session)
+
+        session.uses += 1
+        with self.lock:
+            self.leased[id(session.driver)] = session
+        return session.driver
+
+    def release(self, driver, broken=False):
+        with self.lock:
+            session = self.leased.pop(id(driver))
+
+        if broken or session.uses >= self.max_uses or browser_rss_mb(driver) > self.max_rss_mb:
+            self._destroy(session)
+            return
+
+        try:
+            self._reset(driver)
+        except Exception:
+            self._destroy(session)
+            return
+        self.idle.put(session)
+
+    def _reset(self, driver):
+        # Back to a single blank tab with no leftovers from the previous job
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        if self.clear_cookies:
+            driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        driver = self.acquire(timeout)
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = not self.is_healthy(driver)
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def close(self):
+        while True:
+            try:
+                self._destroy(self.idle.get_nowait())
+            except queue.Empty:
+                break
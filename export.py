@@ -0,0 +1,204 @@
+import os
+import csv
+import gzip
+import json
+import shutil
+import argparse
+import threading
+
+from flask import request, send_file
+
+from extractor import parse_price, split_product_info
+from output import read_json_array, write_json_array
+
+
+# Download formats and the suffix each is stored under, next to the job's JSON
+FORMATS = {"json": ".json", "jsonl.gz": ".jsonl.gz", "csv": ".csv", "parquet": ".parquet"}
+MIMETYPES = {"jsonl.gz": "application/gzip", "csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+# Sent gzip-encoded to clients that accept it; the other formats are compressed already
+COMPRESSIBLE = ("json", "csv")
+
+# Records per Parquet row group, the most an export holds in memory at once
+EXPORT_BATCH = 5000
+PARQUET_COMPRESSION = "zstd"
+# Fast enough to export on request, still most of the size win of level 9
+GZIP_LEVEL = 6
+
+
+class ExportError(Exception):
+    pass
+
+
+def export_format(path):
+    """The format a file name asks for, by its suffix."""
+    for fmt, suffix in sorted(FORMATS.items(), key=lambda item: -len(item[1])):
+        if path.endswith(suffix):
+            return fmt
+    raise ExportError(f"Unknown export format for {os.path.basename(path)}, expected one of {', '.join(FORMATS)}")
+
+
+def flatten_record(record, prefix=""):
+    """One level of columns for a record: nested dicts and lists become
+    ``parent.key`` and ``parent.1`` columns, and the ``Product_Information``
+    text is split into a ``Product_Information.<key>`` column per detail."""
+    flat = {}
+    for key, value in record.items():
+        column = f"{prefix}{key}"
+        if key == "Product_Information" and isinstance(value, str):
+            for info_key, info_value in split_product_info(value):
+                # Some pages list a detail twice; the first one is what the store indexes too
+                flat.setdefault(f"{column}.{info_key}", info_value)
+        elif isinstance(value, dict):
+            flat.update(flatten_record(value, f"{column}."))
+        elif isinstance(value, list):
+            flat.update(flatten_record({str(index): item for index, item in enumerate(value, 1)}, f"{column}."))
+        else:
+            flat[column] = value
+    if not prefix and isinstance(record.get("Price"), str):
+        flat["Price_Value"] = parse_price(record["Price"])
+    return flat
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def scan_columns(records):
+    """Every column of the flattened records in first-seen order, mapped to
+    whether it only ever holds numbers."""
+    columns = {}
+    for record in records:
+        for column, value in flatten_record(record).items():
+            columns[column] = columns.get(column, True) and (value is None or is_number(value))
+    return columns
+
+
+def flat_rows(records, columns):
+    for record in records:
+        flat = flatten_record(record)
+        row = {}
+        for column, numeric in columns.items():
+            value = flat.get(column)
+            if value is not None and not numeric and not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False)
+            row[column] = value
+        yield row
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_export(records, path, fmt=None):
+    """Write records to ``path`` as gzip'd JSON Lines, CSV or Parquet.
+
+    ``records`` is a callable returning a fresh iterable of records: the
+    columnar formats read them twice, once to learn the columns and once to
+    write the rows, so memory stays flat however large the job is.
+    """
+    fmt = fmt or export_format(path)
+    if fmt == "parquet":
+        try:
+            # Imported here: pyarrow adds ~40 MB to every process that loads it, scrapers included
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ExportError("Parquet exports need pyarrow (pip install pyarrow)") from None
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if fmt == "json":
+            write_json_array(records(), tmp_path)
+        elif fmt == "jsonl.gz":
+            with gzip.open(tmp_path, mode="wt", encoding="utf-8", compresslevel=GZIP_LEVEL) as jsonl_file:
+                for record in records():
+                    jsonl_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        elif fmt == "csv":
+            columns = scan_columns(records())
+            with open(tmp_path, mode="w", encoding="utf-8", newline="") as csv_file:
+                writer = csv.DictWriter(csv_file, fieldnames=list(columns))
+                writer.writeheader()
+                writer.writerows(flat_rows(records(), columns))
+        else:
+            columns = scan_columns(records())
+            schema = pa.schema([(column, pa.float64() if numeric else pa.string())
+                                for column, numeric in columns.items()])
+            with pq.ParquetWriter(tmp_path, schema, compression=PARQUET_COMPRESSION) as writer:
+                for batch in batched(flat_rows(records(), columns), EXPORT_BATCH):
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        # Readers of an export only ever see a finished file
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def is_current(path, source_path):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source_path)
+
+
+def export_path(json_path, fmt):
+    return os.path.splitext(json_path)[0] + FORMATS[fmt]
+
+
+def ensure_export(json_path, fmt):
+    """Path of the job output ``json_path`` in ``fmt``, converted on first request
+    and kept next to it until the JSON changes."""
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown export format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    if fmt == "json":
+        return json_path
+    if not json_path.endswith(".json"):
+        raise ExportError(f"Only JSON outputs can be converted, not {os.path.basename(json_path)}")
+    path = export_path(json_path, fmt)
+    if not is_current(path, json_path):
+        write_export(lambda: read_json_array(json_path), path, fmt)
+    return path
+
+
+def ensure_gzip(path):
+    """A gzip'd copy of ``path`` for Content-Encoding, made once per version of the file."""
+    gzip_path = path + ".gz"
+    if not is_current(gzip_path, path):
+        tmp_path = f"{gzip_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(path, mode="rb") as source, gzip.open(tmp_path, mode="wb", compresslevel=GZIP_LEVEL) as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        os.replace(tmp_path, gzip_path)
+    return gzip_path
+
+
+def send_export(json_path, fmt="json"):
+    """Download response for a job output in ``fmt``. JSON and CSV go out gzip
+    encoded when the client accepts it; Range and conditional requests are
+    answered from the file on disk, so interrupted downloads resume."""
+    path = ensure_export(json_path, fmt)
+    name = os.path.basename(path)
+    if fmt in COMPRESSIBLE and request.accept_encodings["gzip"] > 0:
+        response = send_file(ensure_gzip(path), mimetype=MIMETYPES.get(fmt), as_attachment=True,
+                             download_name=name, conditional=True)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = send_file(path, mimetype=MIMETYPES.get(fmt), as_attachment=True, download_name=name,
+                             conditional=True)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+if __name__ == "__main__":
+    # python export.py jobs/amazon_product_details_1a2b3c.json --format csv parquet
+    # python export.py amazon_product_details.json --format jsonl.gz
+    parser = argparse.ArgumentParser(description="Convert a JSON download to gzip'd JSON Lines, CSV or Parquet.")
+    parser.add_argument("json_path")
+    parser.add_argument("--format", nargs="+", choices=[fmt for fmt in FORMATS if fmt != "json"], default=["parquet"])
+    args = parser.parse_args()
+
+    for fmt in args.format:
+        path = write_export(lambda: read_json_array(args.json_path), export_path(args.json_path, fmt), fmt)
+        print(f"📦 {path} ({os.path.getsize(path) / 1024:.0f} KB)")
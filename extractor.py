@@ -0,0 +1,405 @@
+import re
+import sys
+import json
+import time
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup, NavigableString
+
+from field_rules import FieldRules, step
+from urls import canonical_product_url
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+
+# Tags whose content never shows up in the rendered text
+SKIP_TAGS = {"script", "style", "noscript", "template", "head", "svg"}
+
+# Tags that start a new line in the rendered text (like WebElement.text does)
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table",
+    "tbody", "thead", "tfoot", "tr", "ul",
+}
+
+# Table cells are laid out on the same line, separated by a space
+CELL_TAGS = {"td", "th"}
+
+# Product cards on a search results page, and the link to the product page in each
+SEARCH_CARD_SELECTOR = "div[data-component-type='s-search-result'][data-asin]"
+CARD_LINK_SELECTOR = "a.a-link-normal.s-no-outline"
+# The search results pager's next link (a disabled span on the last page)
+NEXT_PAGE_SELECTOR = "a.s-pagination-next"
+
+# The first breadcrumb names the product category ("Books", "Electronics", ...)
+CATEGORY_SELECTOR = "#wayfinding-breadcrumbs_feature_div a"
+
+# Where the first a-price-whole span (what extract_price reads) and the stock message start in the raw HTML
+PRICE_MARKER = re.compile(r"<span\b[^>]*\bclass=\"[^\"]*\ba-price-whole\b")
+AVAILABILITY_MARKER = re.compile(r"<div\b[^>]*\bid=\"availability\"")
+# Characters parsed from each marker; both snippets are a few hundred bytes on real pages
+OFFER_SLICE_SIZE = 4096
+
+
+def parse_html(html):
+    return BeautifulSoup(html, PARSER)
+
+
+def element_text(element):
+    """Approximate Selenium's WebElement.text for a parsed element: one line per
+    block element, whitespace collapsed, empty lines dropped."""
+    if element is None:
+        return ""
+
+    parts = []
+
+    def walk(node):
+        for child in node.children:
+            if isinstance(child, NavigableString):
+                if type(child) is NavigableString:
+                    parts.append(str(child))
+                continue
+            if child.name in SKIP_TAGS:
+                continue
+            if child.name == "br":
+                parts.append("\n")
+                continue
+            if child.name in BLOCK_TAGS:
+                parts.append("\n")
+                walk(child)
+                parts.append("\n")
+            elif child.name in CELL_TAGS:
+                parts.append(" ")
+                walk(child)
+                parts.append(" ")
+            else:
+                walk(child)
+
+    walk(element)
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def filter_lines(text, skip_lines):
+    return [line for line in text.splitlines() if line.strip().lower() not in skip_lines]
+
+
+@step("text")
+def text_step(element):
+    return element_text(element).strip()
+
+
+@step("rstrip")
+def rstrip_step(text, chars):
+    # The whole part of a price carries a nested a-price-decimal "." that the rendered text doesn't show
+    return text.rstrip(chars)
+
+
+@step("attr")
+def attr_step(element, name):
+    return element.get(name)
+
+
+@step("match")
+def match_step(text, pattern):
+    # First group of a regular expression, e.g. "4.1" from "4.1 out of 5 stars"
+    text_match = re.search(pattern, text)
+    return text_match.group(1) if text_match else None
+
+
+@step("first_line")
+def first_line_step(text):
+    return text.splitlines()[0].strip() if text else None
+
+
+@step("drop_first_if")
+def drop_first_if_step(text, phrase):
+    # e.g. the "About this item" heading above the feature bullets
+    lines = text.splitlines()
+    if lines and phrase in lines[0].lower():
+        lines.pop(0)
+    return "\n".join(lines).strip()
+
+
+@step("drop_last_if")
+def drop_last_if_step(text, phrase):
+    # e.g. the "› See more product details" link below them
+    lines = text.splitlines()
+    if lines and phrase in lines[-1].lower():
+        lines.pop()
+    return "\n".join(lines).strip()
+
+
+@step("skip_lines")
+def skip_lines_step(text, skip_lines):
+    return "\n".join(filter_lines(text, skip_lines)).strip()
+
+
+@step("key_value_rows")
+def key_value_rows_step(rows):
+    # Key-value table pairs (filled in once the expanders have been opened)
+    pairs = []
+    for row in rows:
+        key_element = row.find("th")
+        value_element = row.find("td")
+        if key_element is None or value_element is None:
+            continue
+        key = element_text(key_element).strip()
+        value = element_text(value_element).strip()
+        if key and value:
+            pairs.append(f"{key}: {value}")
+    return "\n".join(pairs)
+
+
+@step("first_nonempty")
+def first_nonempty_step(texts):
+    return next((text for text in texts if text), None)
+
+
+@step("first_without")
+def first_without_step(texts, keywords):
+    # The first row of text that isn't reviewer or helpfulness chrome
+    return next((text for text in texts if text and not any(kw in text.lower() for kw in keywords)), None)
+
+
+def site_context(url, category=""):
+    """What the field rules learn hit rates for: the site and, on product pages, the category."""
+    return f"{urlparse(url).netloc if url else ''}/{category}"
+
+
+def page_context(soup, url=None):
+    category_element = soup.select_one(CATEGORY_SELECTOR)
+    return site_context(url, element_text(category_element).strip() if category_element is not None else "")
+
+
+def extract_price(soup, context=""):
+    return RULES.extract("product", "Price", soup, context)
+
+
+def parse_price(price_text):
+    """Number from a scraped price such as "1,658" or "₹1,658.00"; None for "N/A"."""
+    price_match = re.search(r"\d[\d,]*(?:\.\d+)?", price_text or "")
+    return float(price_match.group(0).replace(",", "")) if price_match else None
+
+
+def extract_availability(soup, context=""):
+    # First line of the buy box stock message: "In stock", "Only 3 left in stock.", "Currently unavailable."
+    return RULES.extract("product", "Availability", soup, context)
+
+
+def html_around(html, marker, size=OFFER_SLICE_SIZE):
+    """Parse only ``size`` characters of the page from where ``marker`` matches
+    (nothing when it doesn't), instead of the whole page."""
+    marker_match = marker.search(html)
+    return parse_html(html[marker_match.start():marker_match.start() + size] if marker_match else "")
+
+
+def extract_offer(html):
+    """Price and availability of a product page, for the price watch. Only the
+    two buy box snippets are parsed, so this costs a fraction of ``extract_product``."""
+    return {
+        "Price": extract_price(html_around(html, PRICE_MARKER)),
+        "Availability": extract_availability(html_around(html, AVAILABILITY_MARKER)),
+    }
+
+
+def split_product_info(info_text):
+    """Key/value pairs from a ``Product_Information`` string. Lines without a
+    colon continue the previous value ("16,531 ratings" after "Customer
+    Reviews: 4.1"), or stand alone with an empty value when there is none."""
+    pairs = []
+    for line in (info_text or "").splitlines():
+        # Detail bullets put right-to-left/left-to-right marks around their colons
+        line = line.replace("\u200e", "").replace("\u200f", "").strip()
+        if not line or line == "N/A":
+            continue
+        key, colon, value = line.partition(":")
+        if colon and key.strip():
+            pairs.append([key.strip(), value.lstrip(": ").strip()])
+        elif pairs and pairs[-1][1]:
+            pairs[-1][1] += "\n" + line
+        else:
+            pairs.append([line, ""])
+    return [tuple(pair) for pair in pairs]
+
+
+def clean_aplus_text(text_content):
+    # Remove unwanted sections like "From the Brand", "Click to play video"
+    cleaned_lines = []
+    skip_section = False
+    for line in text_content.splitlines():
+        lower_line = line.strip().lower()
+        if "from the brand" in lower_line or "click to play video" in lower_line:
+            skip_section = True
+        elif skip_section and lower_line == "":
+            skip_section = False
+        elif not skip_section and lower_line not in ["product description"]:
+            cleaned_lines.append(line.strip())
+
+    return "\n".join(cleaned_lines).strip()
+
+
+@step("aplus")
+def aplus_step(aplus_element):
+    # Unique image URLs
+    image_tags = re.findall(r'<img[^>]+src="([^">]+)"', aplus_element.decode_contents())
+    return {
+        "text": clean_aplus_text(element_text(aplus_element).strip()) or "N/A",
+        "images": list(dict.fromkeys(image_tags)),
+    }
+
+
+@step("description")
+def description_step(description_element):
+    # Basic product description, without images
+    return {"text": element_text(description_element).strip() or "N/A", "images": []}
+
+
+# Every step is registered by now, so the rules can be loaded
+RULES = FieldRules()
+
+# Fields of a product record, in output order
+PRODUCT_FIELDS = ["Title", "Price", "About_this_Item", "Product_Information", "Product_Description"]
+
+
+def extract_product(html, url=None):
+    """Parse a product page's HTML (e.g. ``driver.page_source``) into the
+    record written by ``scrape_from_landing_page``. ``url`` tells the field
+    rules which site the page is from."""
+    soup = parse_html(html)
+    context = page_context(soup, url)
+    return {field: RULES.extract("product", field, soup, context) for field in PRODUCT_FIELDS}
+
+
+# Fields of a search result card, in output order
+CARD_FIELDS = ["Title", "Price", "Rating", "Review_Count", "Thumbnail"]
+
+
+def extract_search_page(html, page_url=None):
+    """Everything a search results page shows about each product, without
+    opening it: ``ASIN``, ``URL`` (canonical ``/dp/ASIN``) and the card fields, "N/A" where
+    a card doesn't show one, plus the next page's URL (None on the last page).
+    Sponsored placeholders without an ASIN are skipped."""
+    soup = parse_html(html)
+    context = site_context(page_url, "search")
+    cards = []
+    for card in soup.select(SEARCH_CARD_SELECTOR):
+        link = card.select_one(CARD_LINK_SELECTOR)
+        if not card["data-asin"] or link is None or not link.get("href"):
+            continue
+        # Sponsored slots link through a click-tracking redirect; the canonical URL names the product
+        record = {"ASIN": card["data-asin"], "URL": canonical_product_url(urljoin(page_url or "", link["href"]))}
+        for field in CARD_FIELDS:
+            record[field] = RULES.extract("card", field, card, context)
+        cards.append(record)
+
+    next_link = soup.select_one(NEXT_PAGE_SELECTOR)
+    next_url = urljoin(page_url or "", next_link["href"]) if next_link is not None and next_link.get("href") else None
+    return cards, next_url
+
+
+def extract_search_cards(html, page_url=None):
+    return extract_search_page(html, page_url)[0]
+
+
+def parse_review_date(raw_date_text):
+    # Extract the part after "on" (e.g., "18 May 2025") and format it as dd/mm/yyyy
+    try:
+        date_part = raw_date_text.strip().split("on")[-1].strip()
+        return datetime.strptime(date_part, "%d %B %Y").strftime("%d/%m/%Y")
+    except ValueError:
+        return "N/A"
+
+
+def parse_review_rating(rating_text):
+    rating_match = re.search(r"(\d+\.?\d*) out of 5", rating_text.strip())
+    return rating_match.group(1) if rating_match else "N/A"
+
+
+def clean_review_body(body):
+    if body != "N/A":
+        body = body.replace("Click to play video", "").strip()
+        if not body:
+            body = "N/A"
+    return body
+
+
+def is_reviewer_profile(element):
+    classes = element.get("class", [])
+    return ("a-profile-name" in classes or "a-profile-content" in classes
+            or element.find_parent(class_="a-profile-content") is not None)
+
+
+def build_review(raw_review, context=""):
+    """Apply the review parsing rules to a review's raw text: a dict with
+    ``date``, ``rating``, ``title`` and ``body`` (None when the element is
+    missing), ``body_spans`` and ``candidates``, as produced by
+    ``raw_review_from_html`` or the batched in-browser script. The body goes
+    through the Review_Body field rules."""
+    date, rating, title = raw_review["date"], raw_review["rating"], raw_review["title"]
+    return {
+        "Review_Date": parse_review_date(date) if date is not None else "N/A",
+        "User_Rating_out_of_5": parse_review_rating(rating) if rating is not None else "N/A",
+        "Review_Title": title.strip() if title is not None else "N/A",
+        "Review_Body": clean_review_body(RULES.extract("review", "Review_Body", raw_review, context))
+    }
+
+
+def raw_review_from_html(review):
+    def text(element):
+        return element_text(element).strip() if element is not None else None
+
+    body_element = review.select_one("span[data-hook='review-body']")
+    rating_element = review.select_one("i[data-hook='review-star-rating'], i[data-hook='cmps-review-star-rating']")
+    return {
+        "date": text(review.select_one("span[data-hook='review-date']")),
+        # textContent, so the visually hidden "4.0 out of 5 stars" label is included
+        "rating": rating_element.get_text() if rating_element is not None else None,
+        "title": text(review.select_one(".a-size-base.a-link-normal.review-title.a-color-base.review-title-content.a-text-bold")),
+        "body": text(body_element),
+        "body_spans": [text(s) for s in body_element.find_all("span")] if body_element is not None else [],
+        # Only walked when the body is missing, so computed lazily
+        "candidates": (text(c) for c in review.select("div.a-row, span") if not is_reviewer_profile(c)),
+    }
+
+
+def extract_review_page(html, url=None):
+    """Parse every ``.review`` on a review page into the records written by
+    ``scrape_reviews``, and tell whether the page links to a next one."""
+    soup = parse_html(html)
+    context = page_context(soup, url)
+    reviews = [build_review(raw_review_from_html(review), context) for review in soup.select(".review")]
+    return reviews, soup.select_one("li.a-last a") is not None
+
+
+def extract_reviews(html, url=None):
+    return extract_review_page(html, url)[0]
+
+
+def extract_product_from_file(path):
+    with open(path, mode="r", encoding="utf-8") as html_file:
+        return extract_product(html_file.read())
+
+
+if __name__ == "__main__":
+    # Re-parse saved product pages without a browser:
+    #   python extractor.py saved_page_1.html saved_page_2.html > products.json
+    if len(sys.argv) < 2:
+        print("Usage: python extractor.py PAGE.html [PAGE.html ...]", file=sys.stderr)
+        sys.exit(1)
+
+    products = []
+    started = time.perf_counter()
+    for path in sys.argv[1:]:
+        products.append(extract_product_from_file(path))
+    elapsed = time.perf_counter() - started
+
+    json.dump(products, sys.stdout, ensure_ascii=False, indent=4)
+    print(f"\n⏱️ Extracted {len(products)} pages in {elapsed * 1000:.1f} ms "
+          f"({elapsed * 1000 / len(products):.2f} ms/page)", file=sys.stderr)
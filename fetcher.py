@@ -0,0 +1,107 @@
+import time
+import random
+import asyncio
+
+import aiohttp
+
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_1) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.1 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+]
+
+DEFAULT_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# Text that only shows up on Amazon's robot-check and sign-in walls
+BOT_CHALLENGE_MARKERS = [
+    "/errors/validatecaptcha",
+    "enter the characters you see below",
+    "type the characters you see in this image",
+    "to discuss automated access to amazon data",
+    "api-services-support@amazon.com",
+    "id=\"ap_email\"",
+    "name=\"signin\"",
+]
+
+
+def looks_like_bot_challenge(html):
+    lowered = html.lower()
+    return any(marker in lowered for marker in BOT_CHALLENGE_MARKERS)
+
+
+class FetchResult:
+    def __init__(self, url, status=None, html="", elapsed=0.0, error=None):
+        self.url = url
+        self.status = status
+        self.html = html
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def blocked(self):
+        return self.status in (403, 503) or (bool(self.html) and looks_like_bot_challenge(self.html))
+
+    @property
+    def ok(self):
+        return self.error is None and self.status == 200 and not self.blocked
+
+
+class Fetcher:
+    """Plain HTTP fetches over a keep-alive connection pool. Pages that come back
+    blocked or incomplete are left for the caller to retry with Selenium."""
+
+    def __init__(self, user_agents=USER_AGENTS, concurrency=8, per_host=4, timeout=20, pacing=None):
+        self.user_agents = user_agents
+        self.pacing = pacing
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+
+    def headers(self):
+        return {**DEFAULT_HEADERS, "User-Agent": random.choice(self.user_agents)}
+
+    async def _get(self, session, url):
+        started = time.perf_counter()
+        try:
+            async with session.get(url, headers=self.headers()) as response:
+                html = await response.text(errors="replace")
+                return FetchResult(url, response.status, html, time.perf_counter() - started)
+        except Exception as e:
+            return FetchResult(url, elapsed=time.perf_counter() - started, error=e)
+
+    async def _fetch_one(self, session, url):
+        if self.pacing is None:
+            return await self._get(session, url)
+
+        # Rate-limited per host; 503s back the host off and are retried, robot
+        # checks back it off and are left for the browser.
+        for attempt in range(self.pacing.max_retries + 1):
+            await asyncio.sleep(self.pacing.reserve(url))
+            result = await self._get(session, url)
+            if not result.blocked:
+                if result.ok:
+                    self.pacing.success(url)
+                return result
+            self.pacing.backoff(url, give_up=False)
+            if result.status != 503:
+                return result
+        return result
+
+    async def fetch_many(self, urls):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host, keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            return await asyncio.gather(*(self._fetch_one(session, url) for url in urls))
+
+    def fetch_all(self, urls):
+        """Fetch every URL concurrently and return the results in input order."""
+        if not urls:
+            return []
+        return asyncio.run(self.fetch_many(urls))
+
+    def fetch(self, url):
+        return self.fetch_all([url])[0]
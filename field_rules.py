@@ -0,0 +1,142 @@
+import os
+import json
+import threading
+from copy import deepcopy
+
+from metrics import record_field
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Selectors, post-processing steps and fallback order of every extracted field
+FIELD_RULES_PATH = os.path.join(BASE_DIR, "field_rules.json")
+# Per-context hit counts, carried over between runs
+FIELD_STATS_PATH = os.path.join(BASE_DIR, "field_stats.json")
+
+# Counts are halved past this many tries, so the rates follow layout changes
+STATS_WINDOW = 1000
+
+# Post-processing steps by name, registered with @step by the extractors
+STEPS = {}
+
+
+def step(name):
+    """Register a post-processing step usable in field_rules.json. It receives
+    the value so far (plus its argument, for ``{"name": argument}`` entries) and
+    returns the new value, or None when the rule found nothing."""
+    def register(function):
+        STEPS[name] = function
+        return function
+    return register
+
+
+class Rule:
+    """One way of finding a field: a CSS selector (``css`` for the first match,
+    ``css_all`` for every match) or a ``key`` of an already extracted dict,
+    followed by the post-processing ``steps``."""
+
+    def __init__(self, source, css=None, css_all=None, key=None, steps=()):
+        if sum(lookup is not None for lookup in (css, css_all, key)) != 1:
+            raise ValueError(f"Rule {source!r} needs exactly one of css, css_all or key")
+        self.source = source
+        self.css = css
+        self.css_all = css_all
+        self.key = key
+        self.steps = []
+        for entry in steps:
+            name, argument = next(iter(entry.items())) if isinstance(entry, dict) else (entry, None)
+            if name not in STEPS:
+                raise ValueError(f"Rule {source!r} uses unknown step {name!r}")
+            self.steps.append((STEPS[name], argument, isinstance(entry, dict)))
+
+    def apply(self, document):
+        if self.css is not None:
+            value = document.select_one(self.css)
+        elif self.css_all is not None:
+            value = document.select(self.css_all) or None
+        else:
+            value = document.get(self.key)
+
+        for function, argument, has_argument in self.steps:
+            if value is None:
+                break
+            value = function(value, argument) if has_argument else function(value)
+        # Empty text or lists count as not found, so the next rule gets its turn
+        return value or None
+
+
+class FieldRules:
+    """The field rules of field_rules.json.
+
+    Rules are always tried in their listed order, so a page extracts the same
+    way whatever ran before: several rules can match the same page (the
+    key/value table sits inside the product details wrapper) and the more
+    precise one must win. Hit counts per context (a site and product
+    category) are kept for the metrics and hit_rates() only, to spot rules
+    that stopped matching. New layouts are a new rule in the JSON file, no
+    code change needed.
+    """
+
+    def __init__(self, path=None, stats_path=None):
+        self.path = path or FIELD_RULES_PATH
+        self.stats_path = stats_path or FIELD_STATS_PATH
+        with open(self.path, mode="r", encoding="utf-8") as rules_file:
+            definitions = json.load(rules_file)
+
+        self.fields = {}
+        for kind, fields in definitions.items():
+            for field, definition in fields.items():
+                rules = [Rule(**rule) for rule in definition["rules"]]
+                self.fields[kind, field] = (rules, definition.get("default", "N/A"))
+
+        # (context, field, source) -> [tries, hits]
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.load_stats()
+
+    def record(self, context, field, source, hit):
+        with self.lock:
+            counts = self.stats.setdefault((context, field, source), [0, 0])
+            counts[0] += 1
+            counts[1] += hit
+            if counts[0] > STATS_WINDOW:
+                counts[0] //= 2
+                counts[1] //= 2
+
+    def extract(self, kind, field, document, context=""):
+        """Value of ``field`` from the first rule that finds it, else the field's default."""
+        rules, default = self.fields[kind, field]
+        for rule in rules:
+            value = rule.apply(document)
+            self.record(context, field, rule.source, value is not None)
+            if value is not None:
+                record_field(field, rule.source)
+                return value
+        record_field(field, "missing")
+        return deepcopy(default)
+
+    def hit_rates(self):
+        """{context: {field: {source: (tries, hits)}}} for everything seen so far."""
+        rates = {}
+        with self.lock:
+            for (context, field, source), (tries, hits) in sorted(self.stats.items()):
+                rates.setdefault(context, {}).setdefault(field, {})[source] = (tries, hits)
+        return rates
+
+    def load_stats(self):
+        try:
+            with open(self.stats_path, mode="r", encoding="utf-8") as stats_file:
+                saved = json.load(stats_file)
+        except (OSError, ValueError):
+            return
+        with self.lock:
+            for context, fields in saved.items():
+                for field, sources in fields.items():
+                    for source, counts in sources.items():
+                        self.stats[context, field, source] = list(counts)
+
+    def save_stats(self):
+        # Jobs on other threads may save at the same time
+        tmp_path = f"{self.stats_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as stats_file:
+            json.dump(self.hit_rates(), stats_file, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.stats_path)
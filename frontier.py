@@ -0,0 +1,530 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import contextlib
+import multiprocessing
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+
+from output import write_json_array
+from metrics import incr
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Where workers find the shared queue unless --frontier or SCRAPER_FRONTIER says otherwise
+FRONTIER_URL = os.environ.get("SCRAPER_FRONTIER") or f"sqlite:///{os.path.join(BASE_DIR, 'frontier.db')}"
+
+# A claimed task goes back on the queue if its worker hasn't finished or extended it by then
+LEASE_SECONDS = 300
+# Tries per task (expired leases count) before it's parked as dead
+MAX_ATTEMPTS = 3
+# Wait before a failed task is retried: base * 2^(attempts - 1)
+RETRY_DELAY = 30
+# Tasks a worker claims at once; product tasks in a claim share one HTTP fetch round
+CLAIM_BATCH = 8
+# How long an idle worker waits before asking again while other workers still hold tasks
+POLL_INTERVAL = 2.0
+
+# Search pages are claimed first, since they are what discovers the rest of the work
+PRIORITIES = {"search": 2, "reviews": 1, "product": 0}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    job TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    error TEXT,
+    result TEXT,
+    finished_at REAL,
+    UNIQUE (job, key)
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (job, status, priority, available_at);
+"""
+
+
+class Task:
+    def __init__(self, task_id, job, kind, key, payload, attempts):
+        self.id = task_id
+        self.job = job
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"Task({self.id}, {self.kind}, {self.key})"
+
+
+class Frontier(ABC):
+    """A queue of crawl tasks shared by any number of workers.
+
+    Tasks are deduplicated by ``(job, key)`` (product tasks are keyed by ASIN),
+    claimed under a lease, and either completed with their result, failed
+    (retried with backoff, up to ``max_attempts``) or left to expire, in which
+    case another worker picks them up. Backends implement every abstract method;
+    ``open_frontier`` picks one by URL scheme from ``BACKENDS``.
+    """
+
+    @abstractmethod
+    def add(self, job, tasks):
+        """Queue ``(kind, key, payload)`` tasks; returns how many were new."""
+
+    @abstractmethod
+    def claim(self, job, worker, limit=CLAIM_BATCH, lease_seconds=LEASE_SECONDS):
+        ...
+
+    @abstractmethod
+    def extend(self, tasks, worker, lease_seconds=LEASE_SECONDS):
+        ...
+
+    @abstractmethod
+    def complete(self, task, worker, result=None, new_tasks=()):
+        """Store the result and queue what the task discovered, in one step.
+        False when the lease was lost and another worker owns the task now."""
+
+    @abstractmethod
+    def fail(self, task, worker, error):
+        ...
+
+    @abstractmethod
+    def counts(self, job):
+        """{kind: {status: count}}"""
+
+    @abstractmethod
+    def results(self, job, kind):
+        """``(task, result)`` of the finished tasks of a kind, in the order they were queued."""
+
+    @abstractmethod
+    def retry_dead(self, job):
+        ...
+
+    def close(self):
+        pass
+
+
+class SQLiteFrontier(Frontier):
+    """The frontier in one SQLite file: fine for any number of worker processes
+    on one machine. Claims take the write lock (BEGIN IMMEDIATE), so two
+    workers never get the same task."""
+
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # Autocommit mode, so transactions are only the explicit BEGIN IMMEDIATE ones
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _insert(self, conn, job, tasks):
+        now = time.time()
+        added = 0
+        for kind, key, payload in tasks:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO tasks (job, kind, key, payload, priority, available_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job, kind, key, json.dumps(payload, ensure_ascii=False), PRIORITIES.get(kind, 0), now))
+            added += cursor.rowcount
+        return added
+
+    def add(self, job, tasks):
+        with self._transaction() as conn:
+            return self._insert(conn, job, tasks)
+
+    def claim(self, job, worker, limit=CLAIM_BATCH, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        with self._transaction() as conn:
+            # Leases of dead workers that already used up their attempts end here
+            conn.execute(
+                "UPDATE tasks SET status = 'dead', error = 'lease expired', worker = NULL "
+                "WHERE job = ? AND status = 'leased' AND lease_expires <= ? AND attempts >= ?",
+                (job, now, self.max_attempts))
+            rows = conn.execute(
+                "SELECT id, kind, key, payload, attempts FROM tasks WHERE job = ? AND ("
+                "(status = 'queued' AND available_at <= ?) OR (status = 'leased' AND lease_expires <= ?)) "
+                "ORDER BY priority DESC, id LIMIT ?", (job, now, now, limit)).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                [(worker, now + lease_seconds, row[0]) for row in rows])
+        return [Task(task_id, job, kind, key, json.loads(payload), attempts + 1)
+                for task_id, kind, key, payload, attempts in rows]
+
+    def extend(self, tasks, worker, lease_seconds=LEASE_SECONDS):
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE tasks SET lease_expires = ? WHERE id = ? AND status = 'leased' AND worker = ?",
+                [(time.time() + lease_seconds, task.id, worker) for task in tasks])
+
+    def complete(self, task, worker, result=None, new_tasks=()):
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, error = NULL, finished_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND status = 'leased' AND worker = ?",
+                (json.dumps(result, ensure_ascii=False), time.time(), task.id, worker))
+            if not cursor.rowcount:
+                return False
+            self._insert(conn, task.job, new_tasks)
+            return True
+
+    def fail(self, task, worker, error):
+        # Only a lease still held fails: a finished task, or one someone else now holds, stays as it is
+        with self._transaction() as conn:
+            if task.attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE tasks SET status = 'dead', error = ?, worker = NULL, lease_expires = NULL "
+                    "WHERE id = ? AND status = 'leased' AND worker = ?", (str(error), task.id, worker))
+            else:
+                conn.execute(
+                    "UPDATE tasks SET status = 'queued', error = ?, worker = NULL, lease_expires = NULL, available_at = ? "
+                    "WHERE id = ? AND status = 'leased' AND worker = ?",
+                    (str(error), time.time() + self.retry_delay * 2 ** (task.attempts - 1), task.id, worker))
+
+    def counts(self, job):
+        counts = {}
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT kind, status, COUNT(*) FROM tasks WHERE job = ? GROUP BY kind, status", (job,)).fetchall()
+        for kind, status, count in rows:
+            counts.setdefault(kind, {})[status] = count
+        return counts
+
+    def results(self, job, kind):
+        last_id = 0
+        while True:
+            # Read in pages, so exporting a big job doesn't hold every result in memory
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT id, key, payload, result FROM tasks "
+                    "WHERE job = ? AND kind = ? AND status = 'done' AND id > ? ORDER BY id LIMIT 500",
+                    (job, kind, last_id)).fetchall()
+            if not rows:
+                return
+            for task_id, key, payload, result in rows:
+                yield Task(task_id, job, kind, key, json.loads(payload), 0), json.loads(result)
+            last_id = rows[-1][0]
+
+    def retry_dead(self, job):
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE tasks SET status = 'queued', attempts = 0, available_at = ? WHERE job = ? AND status = 'dead'",
+                (time.time(), job)).rowcount
+
+    def close(self):
+        self.conn.close()
+
+
+# URL scheme -> backend; a networked store (Redis, Postgres, ...) registers itself here
+BACKENDS = {"sqlite": lambda url: SQLiteFrontier(urlparse(url).path or os.path.join(BASE_DIR, "frontier.db"))}
+
+
+def open_frontier(url=None):
+    url = url or FRONTIER_URL
+    scheme = urlparse(url).scheme
+    if scheme not in BACKENDS:
+        raise ValueError(f"No frontier backend for {scheme!r} URLs (known: {', '.join(sorted(BACKENDS))})")
+    return BACKENDS[scheme](url)
+
+
+def search_task(landing_url, page, max_pages, url=None):
+    return "search", f"search:{landing_url}:{page}", {"landing_url": landing_url, "url": url or landing_url,
+                                                      "page": page, "max_pages": max_pages}
+
+
+def product_task(asin, url):
+    # One task per ASIN however many search pages list it
+    return "product", f"product:{asin}", {"asin": asin, "url": url}
+
+
+def review_task(asin, page, max_pages):
+    return "reviews", f"reviews:{asin}:{page}", {"asin": asin, "page": page, "max_pages": max_pages}
+
+
+class FrontierWorker:
+    """Claims tasks of one job and runs them with the scrapers' own logic:
+    search pages spawn product tasks (and the next search page), product
+    tasks go through ``scrape_products`` (plain HTTP first, pooled browsers
+    for the rest) and review pages spawn the next review page."""
+
+    def __init__(self, frontier, job, http_first=True, pacing=None, worker_count=None, claim_batch=CLAIM_BATCH):
+        # The scrapers start browser pools and Flask apps on import, which the CLI's status/export don't need
+        import app
+        import product_reviews
+        from fetcher import Fetcher, USER_AGENTS
+        from pacing import Pacing
+
+        self.app = app
+        self.product_reviews = product_reviews
+        self.frontier = frontier
+        self.job = job
+        self.claim_batch = claim_batch
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.pacing = pacing or Pacing()
+        self.fetcher = Fetcher(USER_AGENTS, concurrency=app.HTTP_CONCURRENCY, per_host=app.MAX_CONCURRENCY_PER_HOST,
+                               pacing=self.pacing) if http_first else None
+        self.workers = app.ProductWorkers(worker_count or app.DEFAULT_WORKERS, self.pacing)
+        self.stats = {"done": 0, "failed": 0, "lost": 0}
+
+    def finish(self, task, result=None, new_tasks=()):
+        if self.frontier.complete(task, self.id, result, new_tasks):
+            self.stats["done"] += 1
+            incr("scraper_frontier_tasks_total", kind=task.kind, result="done")
+        else:
+            # Our lease ran out and someone else has the task now; their result wins
+            self.stats["lost"] += 1
+            incr("scraper_frontier_tasks_total", kind=task.kind, result="lost")
+
+    def give_up(self, task, error):
+        print(f"❌ {task.kind} task {task.key} failed (attempt {task.attempts}): {error}")
+        self.frontier.fail(task, self.id, error)
+        self.stats["failed"] += 1
+        incr("scraper_frontier_tasks_total", kind=task.kind, result="failed")
+
+    def load_in_browser(self, pool, url, ready):
+        """Page source of ``url`` from a pooled browser, once ``ready`` holds."""
+        driver = pool.acquire()
+        broken = False
+        try:
+            self.pacing.wait_turn(url)
+            driver.get(url)
+            self.pacing.wait_for(driver, ready)
+            return driver.page_source
+        except Exception:
+            broken = not pool.is_healthy(driver)
+            raise
+        finally:
+            pool.release(driver, broken)
+
+    def run_search(self, task):
+        from extractor import extract_search_page
+
+        payload = task.payload
+        cards, next_url = [], None
+        if self.fetcher is not None:
+            result = self.fetcher.fetch(payload["url"])
+            if result.ok:
+                cards, next_url = extract_search_page(result.html, payload["url"])
+            if not cards:
+                # Blocked, a soft block the markers missed, or results that only render in a browser
+                incr("scraper_http_escalations_total",
+                     reason="missing_fields" if result.ok else "blocked" if result.blocked else "error")
+        if not cards:
+            html = self.load_in_browser(self.app.get_driver_pool("full"), payload["url"], self.app.search_results_present)
+            cards, next_url = extract_search_page(html, payload["url"])
+        if not cards:
+            raise ValueError("no search results on the page")
+
+        new_tasks = [product_task(card["ASIN"], card["URL"]) for card in cards]
+        if next_url and payload["page"] < payload["max_pages"]:
+            new_tasks.append(search_task(payload["landing_url"], payload["page"] + 1, payload["max_pages"], next_url))
+        print(f"🔎 Search page {payload['page']}: {len(cards)} products")
+        self.finish(task, {"products": len(cards), "next": next_url}, new_tasks)
+
+    def run_products(self, tasks):
+        urls = [task.payload["url"] for task in tasks]
+        remaining = list(tasks)
+        try:
+            for task, (url, product) in zip(tasks, self.app.scrape_products(urls, self.fetcher, self.workers)):
+                remaining.remove(task)
+                if product is None:
+                    self.give_up(task, "product page failed or was blocked")
+                else:
+                    self.finish(task, product)
+                # Browser products take a while each; keep the rest of the claim from expiring meanwhile
+                self.frontier.extend(remaining, self.id)
+        except Exception as e:
+            # e.g. BlockedError once the host keeps blocking; products already finished keep their result
+            for task in remaining:
+                self.give_up(task, f"{type(e).__name__}: {e}")
+
+    def run_reviews(self, task):
+        from extractor import extract_review_page, build_review, site_context
+        from selenium.webdriver.common.by import By
+
+        payload = task.payload
+        url = self.product_reviews.review_page_url(payload["asin"], payload["page"])
+        reviews, has_next = None, False
+        if self.fetcher is not None:
+            result = self.fetcher.fetch(url)
+            if result.ok:
+                reviews, has_next = extract_review_page(result.html, url)
+        if not reviews:
+            # Blocked, or a page that only renders its reviews in a browser
+            pool = self.product_reviews.driver_pool
+            driver = pool.acquire()
+            broken = False
+            try:
+                self.pacing.wait_turn(url)
+                driver.get(url)
+                self.pacing.wait_for(driver, self.product_reviews.review_page_loaded)
+                reviews = [build_review(raw_review, site_context(url))
+                           for raw_review in driver.execute_script(self.product_reviews.BATCHED_REVIEWS_JS)]
+                has_next = bool(driver.find_elements(By.CSS_SELECTOR, "li.a-last a"))
+            except Exception:
+                broken = not pool.is_healthy(driver)
+                raise
+            finally:
+                pool.release(driver, broken)
+
+        new_tasks = []
+        if reviews and has_next and payload["page"] < payload["max_pages"]:
+            new_tasks.append(review_task(payload["asin"], payload["page"] + 1, payload["max_pages"]))
+        print(f"💬 {payload['asin']} review page {payload['page']}: {len(reviews)} reviews")
+        self.finish(task, reviews, new_tasks)
+
+    def run(self, exit_when_idle=True):
+        """Work until the job has nothing left (or forever, when ``exit_when_idle`` is False)."""
+        started = time.perf_counter()
+        try:
+            while True:
+                tasks = self.frontier.claim(self.job, self.id, self.claim_batch)
+                if not tasks:
+                    counts = self.frontier.counts(self.job)
+                    outstanding = sum(statuses.get("queued", 0) + statuses.get("leased", 0) for statuses in counts.values())
+                    if exit_when_idle and not outstanding:
+                        break
+                    time.sleep(POLL_INTERVAL)
+                    continue
+
+                products = [task for task in tasks if task.kind == "product"]
+                for task in tasks:
+                    if task.kind == "product":
+                        continue
+                    try:
+                        if task.kind == "search":
+                            self.run_search(task)
+                        elif task.kind == "reviews":
+                            self.run_reviews(task)
+                        else:
+                            raise ValueError(f"unknown task kind {task.kind!r}")
+                    except Exception as e:
+                        self.give_up(task, f"{type(e).__name__}: {e}")
+                if products:
+                    self.run_products(products)
+        finally:
+            self.workers.close()
+
+        elapsed = time.perf_counter() - started
+        print(f"🏁 Worker {self.id}: {self.stats['done']} done, {self.stats['failed']} failed, "
+              f"{self.stats['lost']} lost leases in {elapsed:.1f}s")
+        return self.stats
+
+
+def run_worker(frontier_url, job, http_first=True, worker_count=None, rate=None, index=0):
+    from pacing import Pacing
+    import product_reviews
+
+    # Review browsers of every worker process get their own Chrome profiles, copied from the login ones
+    product_reviews.profile_set = f"worker_{index}"
+    frontier = open_frontier(frontier_url)
+    # Every worker process paces itself, so the host sees processes x rate requests per second
+    pacing = Pacing(requests_per_second=rate, burst=max(4, int(rate * 2))) if rate else None
+    try:
+        return FrontierWorker(frontier, job, http_first=http_first, pacing=pacing, worker_count=worker_count).run()
+    finally:
+        frontier.close()
+
+
+def export_job(frontier, job, json_path, kind="product"):
+    """Write a job's finished products (or reviews, each tagged with its ASIN) as one JSON array."""
+    def records():
+        if kind == "reviews":
+            pages = sorted(frontier.results(job, "reviews"), key=lambda item: (item[0].payload["asin"], item[0].payload["page"]))
+            for task, reviews in pages:
+                for review in reviews:
+                    yield {"ASIN": task.payload["asin"], **review}
+        else:
+            for task, product in frontier.results(job, "product"):
+                yield product
+
+    return write_json_array(records(), json_path)
+
+
+if __name__ == "__main__":
+    # One box, four worker processes:
+    #   python frontier.py seed globes --search "https://www.amazon.in/s?k=globe" --pages 5
+    #   python frontier.py work globes --processes 4
+    #   python frontier.py status globes
+    #   python frontier.py export globes globes.json
+    # Several boxes run `work` against a shared backend: --frontier <scheme>://... (see BACKENDS)
+    parser = argparse.ArgumentParser(description="Shared crawl frontier for scrape jobs split over many workers.")
+    parser.add_argument("--frontier", default=None, help=f"backend URL (default {FRONTIER_URL})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("seed", help="queue search pages or review pages for a job")
+    seed.add_argument("job")
+    seed.add_argument("--search", action="append", default=[], help="search results URL (repeatable)")
+    seed.add_argument("--reviews", nargs="+", default=[], metavar="ASIN", help="ASINs or product URLs")
+    seed.add_argument("--pages", type=int, default=1, help="search or review pages per seed")
+
+    work = commands.add_parser("work", help="claim and run tasks until the job is done")
+    work.add_argument("job")
+    work.add_argument("--processes", type=int, default=1)
+    work.add_argument("--workers", type=int, default=None, help="browser workers per process")
+    work.add_argument("--browser-only", action="store_true", help="skip the plain HTTP attempt")
+    work.add_argument("--rate", type=float, default=None, help="requests per second to the host, per process")
+
+    status = commands.add_parser("status", help="task counts by kind and status")
+    status.add_argument("job")
+
+    retry = commands.add_parser("retry", help="queue a job's dead tasks again")
+    retry.add_argument("job")
+
+    export = commands.add_parser("export", help="write a job's results as JSON")
+    export.add_argument("job")
+    export.add_argument("json_path")
+    export.add_argument("--kind", choices=["product", "reviews"], default="product")
+
+    args = parser.parse_args()
+    frontier = open_frontier(args.frontier)
+    try:
+        if args.command == "seed":
+            from urls import clean_amazon_url, parse_asins
+
+            tasks = [search_task(clean_amazon_url(url), 1, args.pages) for url in args.search]
+            tasks += [review_task(asin, 1, args.pages) for asin in parse_asins(" ".join(args.reviews))]
+            print(f"🌱 Queued {frontier.add(args.job, tasks)} new tasks for {args.job}")
+        elif args.command == "work":
+            worker_args = (args.frontier, args.job, not args.browser_only, args.workers, args.rate)
+            if args.processes > 1:
+                processes = [multiprocessing.Process(target=run_worker, args=(*worker_args, index))
+                             for index in range(args.processes)]
+                for process in processes:
+                    process.start()
+                for process in processes:
+                    process.join()
+            else:
+                run_worker(*worker_args)
+        elif args.command == "status":
+            for kind, statuses in sorted(frontier.counts(args.job).items()):
+                print(f"{kind:<8} " + "  ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+        elif args.command == "retry":
+            print(f"🔁 {frontier.retry_dead(args.job)} dead tasks queued again")
+        else:
+            export_job(frontier, args.job, args.json_path, args.kind)
+            print(f"📤 Exported {args.job} to {args.json_path}")
+    finally:
+        frontier.close()
@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import sqlite3
+import argparse
+import mimetypes
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+
+try:
+    from PIL import Image
+except ImportError:
+    # Thumbnails are optional; everything else works without Pillow
+    Image = None
+
+from fetcher import DEFAULT_HEADERS, USER_AGENTS
+from metrics import incr, span
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(BASE_DIR, "images")
+
+# Concurrent image downloads overall and per host (A+ images all come from Amazon's CDN)
+IMAGE_CONCURRENCY = 16
+IMAGE_PER_HOST = 8
+# Attempts per image within one run; images that still fail are retried by the next run
+IMAGE_RETRIES = 3
+# Longest side of generated thumbnails, in pixels
+THUMBNAIL_SIZE = 256
+
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+
+
+class ImageError(Exception):
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def image_extension(content_type, url):
+    extension = EXTENSIONS.get((content_type or "").split(";")[0].strip())
+    if extension:
+        return extension
+    guessed = os.path.splitext(urlparse(url).path)[1].lower()
+    return guessed if guessed in mimetypes.types_map else ".img"
+
+
+class ImageStore:
+    """Images on disk named by the SHA-256 of their bytes, so a banner shared by
+    a hundred products is stored once, plus an index of which URL resolved to
+    which file, so a URL is only ever downloaded once.
+
+    Downloads land in ``partial/`` first; an interrupted download is picked up
+    from where it stopped on the next attempt.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or IMAGES_DIR
+        os.makedirs(os.path.join(self.directory, "partial"), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(self.directory, "index.db"), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS images (url TEXT PRIMARY KEY, sha256 TEXT, path TEXT, bytes INTEGER, "
+            "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, fetched_at REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256)")
+
+    def close(self):
+        self.conn.close()
+
+    def lookup(self, url):
+        row = self.conn.execute(
+            "SELECT sha256, path, bytes FROM images WHERE url = ? AND sha256 IS NOT NULL", (url,)).fetchone()
+        if row is None or not os.path.exists(os.path.join(self.directory, row[1])):
+            return None
+        return {"sha256": row[0], "path": self.local_path(row[1]), "bytes": row[2]}
+
+    def local_path(self, relative_path):
+        # Paths in product records are relative to the project, like the JSON downloads
+        return os.path.relpath(os.path.join(self.directory, relative_path), BASE_DIR)
+
+    def partial_path(self, url):
+        return os.path.join(self.directory, "partial", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".part")
+
+    def save(self, url, content_type):
+        """Move a finished download into place. Returns the index entry and
+        whether identical bytes were already stored under another URL."""
+        part_path = self.partial_path(url)
+        digest = hashlib.sha256()
+        with open(part_path, mode="rb") as part_file:
+            for chunk in iter(lambda: part_file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        size = os.path.getsize(part_path)
+
+        existing = self.conn.execute("SELECT path FROM images WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        if existing and os.path.exists(os.path.join(self.directory, existing[0])):
+            relative_path = existing[0]
+            os.remove(part_path)
+            deduplicated = True
+        else:
+            relative_path = os.path.join(sha256[:2], sha256 + image_extension(content_type, url))
+            os.makedirs(os.path.join(self.directory, sha256[:2]), exist_ok=True)
+            os.replace(part_path, os.path.join(self.directory, relative_path))
+            deduplicated = False
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO images (url, sha256, path, bytes, attempts, error, fetched_at) VALUES (?, ?, ?, ?, 1, NULL, ?) "
+                "ON CONFLICT (url) DO UPDATE SET sha256 = excluded.sha256, path = excluded.path, "
+                "bytes = excluded.bytes, attempts = attempts + 1, error = NULL, fetched_at = excluded.fetched_at",
+                (url, sha256, relative_path, size, time.time()))
+        return {"sha256": sha256, "path": self.local_path(relative_path), "bytes": size}, deduplicated
+
+    def record_failure(self, url, error):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO images (url, attempts, error) VALUES (?, 1, ?) "
+                "ON CONFLICT (url) DO UPDATE SET attempts = attempts + 1, error = excluded.error",
+                (url, str(error)))
+
+    def thumbnail(self, entry, size=THUMBNAIL_SIZE):
+        """Path of a JPEG thumbnail for a stored image, made on first use."""
+        relative_path = os.path.join("thumbs", f"{entry['sha256']}_{size}.jpg")
+        thumb_path = os.path.join(self.directory, relative_path)
+        if not os.path.exists(thumb_path):
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            with Image.open(os.path.join(BASE_DIR, entry["path"])) as image:
+                image.thumbnail((size, size))
+                image.convert("RGB").save(thumb_path + ".tmp", format="JPEG", quality=85)
+            os.replace(thumb_path + ".tmp", thumb_path)
+        return self.local_path(relative_path)
+
+
+class ImageDownloader:
+    """Downloads product images over one pooled aiohttp session, with a cap on
+    concurrent downloads, retries with backoff and Range-resumed partial files."""
+
+    def __init__(self, store=None, concurrency=IMAGE_CONCURRENCY, per_host=IMAGE_PER_HOST, retries=IMAGE_RETRIES,
+                 timeout=30, thumbnails=False):
+        self.store = store or ImageStore()
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.retries = retries
+        self.timeout = timeout
+        self.thumbnails = thumbnails
+        if thumbnails and Image is None:
+            print("⚠️ Pillow is not installed, skipping thumbnails")
+            self.thumbnails = False
+        self.stats = {"downloaded": 0, "deduplicated": 0, "cached": 0, "failed": 0, "bytes": 0, "seconds": 0.0}
+
+    async def _download(self, session, url):
+        part_path = self.store.partial_path(url)
+        for attempt in range(1, self.retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {**DEFAULT_HEADERS, "Accept": "image/webp,image/*,*/*;q=0.8",
+                       "User-Agent": random.choice(USER_AGENTS)}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 416 and offset:
+                        # The previous attempt already got every byte
+                        return None
+                    if response.status not in (200, 206):
+                        raise ImageError(f"HTTP {response.status}",
+                                         retryable=response.status >= 500 or response.status in (408, 429))
+                    # 206 continues the partial file; a plain 200 starts it over
+                    with open(part_path, mode="ab" if response.status == 206 else "wb") as part_file:
+                        async for chunk in response.content.iter_chunked(64 * 1024):
+                            part_file.write(chunk)
+                    return response.headers.get("Content-Type")
+            except ImageError as e:
+                if not e.retryable or attempt == self.retries:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise ImageError(f"{type(e).__name__}: {e}") from e
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def _fetch(self, session, semaphore, url):
+        entry = self.store.lookup(url)
+        if entry is not None:
+            self.stats["cached"] += 1
+            incr("scraper_images_total", result="cached")
+        else:
+            async with semaphore:
+                try:
+                    content_type = await self._download(session, url)
+                except ImageError as e:
+                    self.store.record_failure(url, e)
+                    self.stats["failed"] += 1
+                    incr("scraper_images_total", result="failed")
+                    print(f"❌ Image failed ({e}): {url}")
+                    return url, {"error": str(e)}
+
+            entry, deduplicated = self.store.save(url, content_type)
+            result = "deduplicated" if deduplicated else "downloaded"
+            self.stats[result] += 1
+            self.stats["bytes"] += entry["bytes"]
+            incr("scraper_images_total", result=result)
+
+        if self.thumbnails:
+            try:
+                entry = dict(entry, thumbnail=self.store.thumbnail(entry))
+            except OSError as e:
+                print(f"⚠️ No thumbnail for {url}: {e}")
+        return url, entry
+
+    async def _fetch_many(self, urls):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host, keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            return dict(await asyncio.gather(*(self._fetch(session, semaphore, url) for url in urls)))
+
+    def download(self, urls):
+        """Fetch every image (absolute URLs), each distinct URL once. Returns
+        URL -> index entry, or ``{"error": ...}`` for failures."""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        started = time.perf_counter()
+        with span("images"):
+            results = asyncio.run(self._fetch_many(urls))
+        self.stats["seconds"] += time.perf_counter() - started
+        return results
+
+    def attach(self, scraped):
+        """Download the images of ``(product_url, product)`` pairs (None products
+        are skipped) and list the stored files under each record's ``Image_Files``."""
+        def image_urls(product_url, product):
+            # A+ src attributes can be relative to the product page; search card records have none
+            return [(image_url, urljoin(product_url or "", image_url))
+                    for image_url in product.get("Product_Description", {}).get("images", [])]
+
+        results = self.download(download_url for product_url, product in scraped if product is not None
+                                for _, download_url in image_urls(product_url, product))
+        for product_url, product in scraped:
+            if product is not None:
+                product["Image_Files"] = [{"url": image_url, **results[download_url]}
+                                          for image_url, download_url in image_urls(product_url, product)]
+        return scraped
+
+    def summary(self):
+        stats = self.stats
+        fetched = stats["downloaded"] + stats["deduplicated"]
+        rate = fetched / stats["seconds"] if stats["seconds"] else 0.0
+        return (f"{stats['downloaded']} downloaded, {stats['deduplicated']} duplicates, {stats['cached']} already stored, "
+                f"{stats['failed']} failed, {stats['bytes'] / 1024:.0f} KB at {rate:.1f} images/s")
+
+
+if __name__ == "__main__":
+    # Add local copies of the A+ images to an earlier JSON download:
+    #   python images.py amazon_product_details.json --thumbnails
+    parser = argparse.ArgumentParser(description="Download the images referenced by scraped products.")
+    parser.add_argument("json_path")
+    parser.add_argument("--out", help="where to write the records with Image_Files (default: in place)")
+    parser.add_argument("--thumbnails", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=IMAGE_CONCURRENCY)
+    args = parser.parse_args()
+
+    with open(args.json_path, mode="r", encoding="utf-8") as json_file:
+        products = json.load(json_file)
+
+    downloader = ImageDownloader(concurrency=args.concurrency, thumbnails=args.thumbnails)
+    downloader.attach([(None, product) for product in products])
+    downloader.store.close()
+
+    with open(args.out or args.json_path, mode="w", encoding="utf-8") as json_file:
+        json.dump(products, json_file, ensure_ascii=False, indent=4)
+    print(f"🖼️ {downloader.summary()}", file=sys.stderr)
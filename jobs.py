@@ -0,0 +1,135 @@
+import os
+import glob
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import Metrics
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DIR = os.path.join(BASE_DIR, "jobs")
+
+# Scrape jobs run in the background on at most this many threads (each drives browsers)
+JOB_WORKERS = 2
+# Submissions beyond this many queued or running jobs are turned away
+MAX_PENDING_JOBS = 20
+# Finished jobs and their output files are removed after this many seconds
+KEEP_FINISHED_FOR = 24 * 60 * 60
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, params, output_name):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.pages_done = 0
+        self.items_done = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.metrics = Metrics()
+        self.output_path = os.path.join(JOBS_DIR, f"{output_name}_{self.id}.json")
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def progress(self, pages_done, items_done):
+        self.pages_done = pages_done
+        self.items_done = items_done
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "pages_done": self.pages_done,
+            "items_done": self.items_done,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "filename": os.path.basename(self.output_path) if self.status == "done" else None,
+            "metrics": self.metrics.summary(),
+        }
+
+
+class JobManager:
+    """Runs scrape jobs on a bounded thread pool so requests return right away.
+
+    ``run(job)`` does the actual scraping; it should write its result to
+    ``job.output_path``, report through ``job.progress`` and record timings
+    in ``job.metrics``.
+    """
+
+    def __init__(self, kind, run, output_name, workers=JOB_WORKERS, max_pending=MAX_PENDING_JOBS,
+                 keep_finished_for=KEEP_FINISHED_FOR):
+        self.kind = kind
+        self.run = run
+        self.output_name = output_name
+        self.max_pending = max_pending
+        self.keep_finished_for = keep_finished_for
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{kind}-job")
+        self.jobs = {}
+        self.lock = threading.Lock()
+        os.makedirs(JOBS_DIR, exist_ok=True)
+
+    def submit(self, **params):
+        self.cleanup()
+        with self.lock:
+            # The same job already queued or running shares its output and checkpoint, so reuse it
+            for job in self.jobs.values():
+                if job.active and job.params == params:
+                    return job
+
+            if sum(job.active for job in self.jobs.values()) >= self.max_pending:
+                raise QueueFullError("Too many jobs are waiting, please try again later")
+
+            job = Job(self.kind, params, self.output_name)
+            self.jobs[job.id] = job
+
+        self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            self.run(job)
+            status = "done"
+        except Exception as e:
+            print(f"❌ Job {job.id} failed: {e}")
+            job.error = str(e)
+            status = "failed"
+        # finished_at first: cleanup() compares it for every job that is no longer active
+        job.finished_at = time.time()
+        job.status = status
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cleanup(self):
+        cutoff = time.time() - self.keep_finished_for
+        with self.lock:
+            expired = [job for job in self.jobs.values()
+                       if not job.active and job.finished_at is not None and job.finished_at < cutoff]
+            for job in expired:
+                del self.jobs[job.id]
+
+        for job in expired:
+            # The JSON output plus any CSV, Parquet or gzip'd copies made for downloads
+            for path in glob.glob(glob.escape(os.path.splitext(job.output_path)[0]) + ".*"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,125 @@
+import time
+import threading
+import contextlib
+
+
+class Metrics:
+    """Counters and timing summaries keyed by name and labels, renderable in the
+    Prometheus text format."""
+
+    def __init__(self):
+        self.counters = {}
+        self.timings = {}
+        self.lock = threading.Lock()
+
+    def incr(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            count, total = self.timings.get(key, (0, 0.0))
+            self.timings[key] = (count + 1, total + seconds)
+
+    def render(self):
+        def label_text(labels):
+            if not labels:
+                return ""
+            pairs = []
+            for key, value in labels:
+                value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+                pairs.append(f'{key}="{value}"')
+            return "{" + ",".join(pairs) + "}"
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+            timings = sorted(self.timings.items())
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{label_text(labels)} {value}")
+        for (name, labels), (count, total) in timings:
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            lines.append(f"{name}_count{label_text(labels)} {count}")
+            lines.append(f"{name}_sum{label_text(labels)} {total:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Plain dict for a job's status page: stage timings plus every counter."""
+        with self.lock:
+            stages = {}
+            for (name, labels), (count, total) in self.timings.items():
+                if name == "scraper_stage_seconds":
+                    stages[dict(labels)["stage"]] = {"count": count, "seconds": round(total, 3)}
+            counters = {}
+            for (name, labels), value in self.counters.items():
+                label = ",".join(f"{k}={v}" for k, v in labels)
+                counters[f"{name}{{{label}}}" if label else name] = value
+        return {"stages": stages, "counters": counters}
+
+
+# Everything the process has done, served on /metrics
+REGISTRY = Metrics()
+
+# The job (a Metrics of its own) the current thread is working for
+current = threading.local()
+
+
+def bind_job(job_metrics):
+    current.job = job_metrics
+
+
+def _targets():
+    job = getattr(current, "job", None)
+    return (REGISTRY, job) if job is not None else (REGISTRY,)
+
+
+def incr(name, amount=1, **labels):
+    for target in _targets():
+        target.incr(name, amount, **labels)
+
+
+def observe(name, seconds, **labels):
+    for target in _targets():
+        target.observe(name, seconds, **labels)
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Time a scraper stage: navigate, wait, scroll, expand, extract, fetch, paginate or write."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("scraper_stage_seconds", time.perf_counter() - started, stage=stage)
+
+
+def record_field(field, source):
+    """Which selector in a field's fallback chain produced the value ("missing" if none)."""
+    incr("scraper_field_source_total", field=field, source=source)
+
+
+def instrument_driver(driver):
+    """Count every WebDriver command (and the ones that raised) going through ``driver``."""
+    execute = driver.execute
+    driver.command_count = 0
+
+    def counted_execute(driver_command, params=None):
+        driver.command_count += 1
+        incr("webdriver_commands_total", command=driver_command)
+        try:
+            return execute(driver_command, params)
+        except Exception:
+            incr("webdriver_command_errors_total", command=driver_command)
+            raise
+
+    driver.execute = counted_execute
+    return driver
@@ -0,0 +1,200 @@
+import os
+import json
+import hashlib
+import threading
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+
+# Keys of the jobs writing their output and checkpoint right now
+ACTIVE_KEYS = set()
+ACTIVE_KEYS_CHANGED = threading.Condition()
+
+
+class JobBusyError(Exception):
+    pass
+
+
+def job_key(*params):
+    """Stable name for a job, so a run started with the same parameters finds
+    the previous run's output and checkpoint."""
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def read_jsonl(path):
+    with open(path, mode="r", encoding="utf-8") as jsonl_file:
+        for line in jsonl_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_json_array(path, chunk_size=1024 * 1024):
+    """Records of a JSON array file one at a time, so exports of large jobs
+    never hold the whole file in memory."""
+    decoder = json.JSONDecoder()
+    with open(path, mode="r", encoding="utf-8") as json_file:
+        buffer = json_file.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not hold a JSON array")
+        position, at_end = 1, False
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            if position < len(buffer):
+                try:
+                    record, position = decoder.raw_decode(buffer, position)
+                    yield record
+                    continue
+                except json.JSONDecodeError:
+                    # A record cut off by the end of the chunk is decoded again once the rest is read
+                    if at_end:
+                        raise
+            elif at_end:
+                raise ValueError(f"{path} ends inside its JSON array")
+            chunk = json_file.read(chunk_size)
+            buffer, position, at_end = buffer[position:] + chunk, 0, not chunk
+
+
+class JsonlWriter:
+    """Appends one JSON record per line and flushes it, so the output on disk is
+    always current. ``keep`` truncates an existing file to its first ``keep``
+    records (the ones a checkpoint vouches for) before appending."""
+
+    def __init__(self, path, keep=0):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.count = self._truncate(keep)
+        self.file = open(path, mode="a", encoding="utf-8")
+
+    def _truncate(self, keep):
+        if not keep or not os.path.exists(self.path):
+            open(self.path, mode="w", encoding="utf-8").close()
+            return 0
+
+        count = 0
+        with open(self.path, mode="r+", encoding="utf-8") as jsonl_file:
+            while count < keep:
+                line = jsonl_file.readline()
+                if not line:
+                    break
+                count += 1
+            jsonl_file.truncate(jsonl_file.tell())
+        return count
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Checkpoint:
+    """Where a job got to: the page it's on (and that page's URL), the product
+    URLs already written and how many records the output holds."""
+
+    def __init__(self, path):
+        self.path = path
+        self.page = 1
+        self.page_url = None
+        self.done = set()
+        self.records = 0
+        self.finished = False
+        self.resumed = False
+
+        if os.path.exists(path):
+            with open(path, mode="r", encoding="utf-8") as checkpoint_file:
+                state = json.load(checkpoint_file)
+            if not state.get("finished"):
+                self.page = state["page"]
+                self.page_url = state.get("page_url")
+                self.done = set(state.get("done", []))
+                self.records = state.get("records", 0)
+                self.resumed = True
+
+    def save(self):
+        state = {
+            "page": self.page,
+            "page_url": self.page_url,
+            "done": sorted(self.done),
+            "records": self.records,
+            "finished": self.finished,
+        }
+        # Write then rename, so a crash mid-save never leaves a corrupt checkpoint
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as checkpoint_file:
+            json.dump(state, checkpoint_file)
+        os.replace(tmp_path, self.path)
+
+    def start_page(self, page, page_url=None, records=None):
+        self.page = page
+        self.page_url = page_url
+        if records is not None:
+            self.records = records
+        self.save()
+
+    def record_written(self, writer, urls=()):
+        self.records = writer.count
+        self.done.update(urls)
+        self.save()
+
+    def finish(self):
+        self.finished = True
+        self.save()
+
+
+def claim_job(key, wait=False):
+    """Make the caller the only writer of ``key``'s output and checkpoint until
+    ``release_job(key)``. A job already holding the key raises JobBusyError,
+    or is waited for with ``wait``."""
+    with ACTIVE_KEYS_CHANGED:
+        if key in ACTIVE_KEYS and not wait:
+            raise JobBusyError("The same scrape is already running in another job, wait for it to finish")
+        ACTIVE_KEYS_CHANGED.wait_for(lambda: key not in ACTIVE_KEYS)
+        ACTIVE_KEYS.add(key)
+
+
+def release_job(key):
+    with ACTIVE_KEYS_CHANGED:
+        ACTIVE_KEYS.discard(key)
+        ACTIVE_KEYS_CHANGED.notify_all()
+
+
+def open_job(key):
+    """Output writer and checkpoint for a job, resuming an unfinished earlier
+    run. The caller must hold the key (see claim_job)."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(OUTPUT_DIR, f"{key}.checkpoint.json"))
+    writer = JsonlWriter(os.path.join(OUTPUT_DIR, f"{key}.jsonl"), keep=checkpoint.records if checkpoint.resumed else 0)
+    if checkpoint.resumed:
+        print(f"⏯️ Resuming from page {checkpoint.page} with {writer.count} records already saved")
+    return writer, checkpoint
+
+
+def export_json(jsonl_path, json_path):
+    return write_json_array(read_jsonl(jsonl_path), json_path)
+
+
+def write_json_array(records, json_path):
+    """Pretty-printed JSON array (same layout as ``json.dump(..., indent=4)``),
+    written one record at a time."""
+    with open(json_path, mode="w", encoding="utf-8") as output_file:
+        output_file.write("[")
+        first = True
+        for record in records:
+            output_file.write("\n" if first else ",\n")
+            pretty = json.dumps(record, ensure_ascii=False, indent=4)
+            output_file.write("\n".join("    " + line for line in pretty.splitlines()))
+            first = False
+        output_file.write("]" if first else "\n]")
+    return json_path
@@ -0,0 +1,178 @@
+import math
+import time
+import threading
+from urllib.parse import urlparse
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+# URL fragments of Amazon's robot-check and sign-in pages
+BLOCKED_URL_MARKERS = ["/errors/validatecaptcha", "/ap/signin", "/ap/cvf/"]
+
+
+class BlockedError(Exception):
+    """The site answered with a captcha or sign-in page instead of content."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket. ``reserve`` hands out the delay until the caller's
+    token is available, so it works for both threads and asyncio tasks."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class Pacing:
+    """Per-job delays, per-host rate limits and block handling.
+
+    Every setting can be overridden per job, e.g. ``Pacing(requests_per_second=1, login_wait=60)``.
+    """
+
+    DEFAULTS = {
+        # Requests allowed per host per second, and how many may go out back to back
+        "requests_per_second": 2.0,
+        "burst": 4,
+        # How long to wait on the first page for a manual login before giving up
+        "login_wait": 0,
+        # Upper bound for readiness waits (search results, reviews, next page)
+        "ready_timeout": 15,
+        # Product pages scroll until their lazy sections render, for at most this many seconds
+        # (keep it under the driver's script timeout, 30 s by default)
+        "scroll_timeout": 5,
+        # Fixed pause between scroll steps; 0 steps once per animation frame instead
+        "scroll_pause": 0,
+        # Backoff after a 503 or robot-check page: base * 2^(strikes - 1), capped
+        "backoff_base": 5.0,
+        "backoff_max": 120.0,
+        # Retries for a plain-HTTP fetch answered with 503
+        "max_retries": 2,
+        # Consecutive blocked pages on a host before the job gives up
+        "max_blocked": 3,
+    }
+
+    # Settings that only make sense as whole numbers, and the ones that must be above zero
+    INTEGER_SETTINGS = ("burst", "max_retries", "max_blocked")
+    POSITIVE_SETTINGS = ("requests_per_second", "burst")
+
+    @classmethod
+    def parse_settings(cls, values):
+        """Overrides for a job from request values (a form or JSON body): every
+        ``DEFAULTS`` key present and non-empty, as a number. Raises ValueError for
+        values that aren't finite, non-negative numbers."""
+        settings = {}
+        for key in cls.DEFAULTS:
+            raw = values.get(key)
+            if raw is None or raw == "":
+                continue
+            try:
+                value = int(raw) if key in cls.INTEGER_SETTINGS else float(raw)
+            except (TypeError, ValueError):
+                kind = "a whole number" if key in cls.INTEGER_SETTINGS else "a number"
+                raise ValueError(f"{key} must be {kind}") from None
+            if not math.isfinite(value) or value < 0 or (value == 0 and key in cls.POSITIVE_SETTINGS):
+                raise ValueError(f"{key} must be {'above' if key in cls.POSITIVE_SETTINGS else 'at least'} 0")
+            settings[key] = value
+        return settings
+
+    def __init__(self, **settings):
+        unknown = set(settings) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown pacing settings: {', '.join(sorted(unknown))}")
+        for key, value in {**self.DEFAULTS, **settings}.items():
+            setattr(self, key, value)
+        self.buckets = {}
+        self.strikes = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+            return self.buckets[host]
+
+    def reserve(self, url):
+        return self.bucket(url).reserve()
+
+    def wait_turn(self, url):
+        self.bucket(url).acquire()
+
+    def backoff(self, url, give_up=True):
+        """Record a blocked response and slow the host down. Raises BlockedError
+        once the host has blocked ``max_blocked`` times in a row, unless
+        ``give_up`` is False."""
+        host = urlparse(url).netloc
+        with self.lock:
+            strikes = self.strikes.get(host, 0) + 1
+            self.strikes[host] = strikes
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (strikes - 1))
+        print(f"🐢 {host} is pushing back (strike {strikes}), backing off {delay:.0f}s")
+        self.bucket(url).pause(delay)
+        if give_up and strikes >= self.max_blocked:
+            raise BlockedError(f"{host} blocked {strikes} requests in a row")
+        return delay
+
+    def success(self, url):
+        with self.lock:
+            self.strikes.pop(urlparse(url).netloc, None)
+
+    def wait_for(self, driver, condition, timeout=None):
+        """WebDriverWait that stops early with BlockedError when a captcha or
+        sign-in page shows up instead of the content being waited for."""
+        def ready(d):
+            if is_blocked_page(d):
+                raise BlockedError(f"Blocked page at {d.current_url}")
+            return condition(d)
+
+        return WebDriverWait(driver, self.ready_timeout if timeout is None else timeout).until(ready)
+
+    def wait_until_loaded(self, driver):
+        return self.wait_for(driver, lambda d: d.execute_script("return document.readyState") != "loading")
+
+    def wait_for_login(self, driver, condition):
+        """Give the user up to ``login_wait`` seconds to get past a sign-in page,
+        returning as soon as ``condition`` holds."""
+        deadline = time.monotonic() + self.login_wait
+        while True:
+            try:
+                if condition(driver):
+                    return
+            except Exception:
+                pass
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(0.5)
+
+        if is_blocked_page(driver):
+            raise BlockedError(f"Still blocked at {driver.current_url} after {self.login_wait}s")
+
+
+def is_blocked_page(driver):
+    url = driver.current_url.lower()
+    if any(marker in url for marker in BLOCKED_URL_MARKERS):
+        return True
+    return bool(driver.find_elements(By.CSS_SELECTOR, "form[action*='validateCaptcha'], #ap_email, #auth-captcha-image"))
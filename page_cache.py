@@ -0,0 +1,101 @@
+import os
+import gzip
+import time
+import hashlib
+import threading
+
+from urls import clean_amazon_url, extract_asin
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "page_cache")
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def cache_key(url):
+    """The product's ASIN, or a hash of the cleaned URL for pages without one."""
+    asin = extract_asin(url)
+    if asin:
+        return asin
+    return hashlib.sha1(clean_amazon_url(url).encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """Gzipped rendered HTML on disk, keyed by ASIN.
+
+    A file's mtime is when the page was fetched (for the TTL) and its atime is
+    when it was last read (for LRU eviction once the cache outgrows ``max_bytes``).
+    The TTL belongs to the job, so jobs with different freshness needs can share
+    one cache directory.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, directory=CACHE_DIR):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self.entries())
+
+    def entries(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".html.gz"):
+                stat = entry.stat()
+                yield stat.st_atime, stat.st_size, entry.path
+
+    def path(self, url):
+        return os.path.join(self.directory, f"{cache_key(url)}.html.gz")
+
+    def get(self, url):
+        path = self.path(url)
+        try:
+            fetched_at = os.stat(path).st_mtime
+            if time.time() - fetched_at > self.ttl:
+                raise FileNotFoundError(path)
+            with gzip.open(path, mode="rt", encoding="utf-8") as cached_file:
+                html = cached_file.read()
+            os.utime(path, (time.time(), fetched_at))
+        except (OSError, EOFError):
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return html
+
+    def put(self, url, html):
+        path = self.path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, mode="wt", encoding="utf-8", compresslevel=6) as cached_file:
+            cached_file.write(html)
+        new_size = os.path.getsize(tmp_path)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.total_bytes += new_size - old_size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self.entries())
+        self.total_bytes = sum(size for _, size, _ in entries)
+
+        # Least recently read first
+        for _, size, path in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.total_bytes -= size
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,171 @@
+import sys
+import json
+import time
+import argparse
+
+from extractor import extract_offer, parse_price
+from fetcher import Fetcher, USER_AGENTS
+from pacing import Pacing
+from store import Store
+from urls import parse_asins
+from metrics import span, incr
+
+
+PRODUCT_URL = "https://www.amazon.in/dp/{asin}"
+
+# Product pages requested at once; the pacing still decides how fast they go out
+WATCH_CONCURRENCY = 32
+# ASINs fetched, diffed and saved together, so memory stays flat for long lists
+WATCH_BATCH = 200
+
+
+def product_url(asin):
+    return PRODUCT_URL.format(asin=asin)
+
+
+def offer_changes(price, availability, previous):
+    """Which of price and availability differ from the ``previous`` snapshot; ["new"] without one."""
+    if previous is None:
+        return ["new"]
+    previous_price, previous_availability = previous
+    changes = []
+    if price != previous_price:
+        changes.append("price")
+    # Full scrapes don't record availability, so there is nothing to compare with yet
+    if previous_availability is not None and availability != previous_availability:
+        changes.append("availability")
+    return changes
+
+
+def watch_prices(asins, concurrency=WATCH_CONCURRENCY, pacing=None, store=None, on_change=None):
+    """Fetch only the product page of every ASIN over plain HTTP, read its price
+    and availability and compare them with the last stored snapshot.
+
+    Nothing is scrolled, expanded or run through the full extractor. Only
+    changes are saved (and passed to ``on_change``), so hourly polling of
+    thousands of ASINs keeps the database small. Returns ``(changes, failed ASINs)``.
+    """
+    pacing = pacing or Pacing()
+    own_store = store is None
+    store = store or Store()
+    fetcher = Fetcher(USER_AGENTS, concurrency=concurrency, per_host=concurrency, pacing=pacing)
+    asins = list(dict.fromkeys(asins))
+    changes, failed = [], []
+    started = time.perf_counter()
+
+    try:
+        for start in range(0, len(asins), WATCH_BATCH):
+            batch = asins[start:start + WATCH_BATCH]
+            previous = store.last_prices(batch)
+            with span("fetch"):
+                results = fetcher.fetch_all([product_url(asin) for asin in batch])
+
+            rows = []
+            checked_at = time.time()
+            for asin, result in zip(batch, results):
+                if not result.ok:
+                    failed.append(asin)
+                    incr("scraper_price_checks_total", result="blocked" if result.blocked else "error")
+                    continue
+                with span("extract"):
+                    offer = extract_offer(result.html)
+                if offer["Price"] == "N/A" and offer["Availability"] == "N/A":
+                    # Neither snippet on the page: not a product page, or a layout we don't know
+                    failed.append(asin)
+                    incr("scraper_price_checks_total", result="missing_fields")
+                    continue
+
+                price = parse_price(offer["Price"])
+                availability = offer["Availability"] if offer["Availability"] != "N/A" else None
+                snapshot = previous.get(asin)
+                changed = offer_changes(price, availability, snapshot)
+                # Also saved: the first stock message for an ASIN only known from full scrapes
+                if changed or (snapshot[1] is None and availability is not None):
+                    rows.append((asin, checked_at, price, availability))
+                if not changed:
+                    incr("scraper_price_checks_total", result="unchanged")
+                    continue
+
+                incr("scraper_price_checks_total", result="changed")
+                change = {
+                    "ASIN": asin,
+                    "Price": price,
+                    "Availability": availability,
+                    "Previous_Price": snapshot[0] if snapshot else None,
+                    "Previous_Availability": snapshot[1] if snapshot else None,
+                    "Changes": changed,
+                    "Checked_At": checked_at,
+                }
+                changes.append(change)
+                if on_change:
+                    on_change(change)
+
+            with span("write"):
+                store.add_prices(rows)
+            print(f"💹 Checked {min(start + WATCH_BATCH, len(asins))}/{len(asins)} ASINs, "
+                  f"{len(changes)} changed, {len(failed)} failed")
+    finally:
+        if own_store:
+            store.close()
+
+    elapsed = time.perf_counter() - started
+    checked = len(asins) - len(failed)
+    print(f"⏱️ {checked} ASINs in {elapsed:.1f}s ({checked / elapsed * 60 if elapsed else 0:.0f}/min)")
+    return changes, failed
+
+
+def describe(change):
+    def price_text(price):
+        return f"{price:,.2f}" if price is not None else "no price"
+
+    if change["Changes"] == ["new"]:
+        return f"🆕 {change['ASIN']}  {price_text(change['Price'])}  {change['Availability'] or ''}"
+    parts = []
+    if "price" in change["Changes"]:
+        parts.append(f"{price_text(change['Previous_Price'])} -> {price_text(change['Price'])}")
+    if "availability" in change["Changes"]:
+        parts.append(f"{change['Previous_Availability']!r} -> {change['Availability']!r}")
+    return f"🔔 {change['ASIN']}  {'  '.join(parts)}"
+
+
+if __name__ == "__main__":
+    # python price_watch.py B0CX1YV1ZB B0D5Y9GXVK
+    # python price_watch.py --file asins.txt --out price_changes.jsonl   (e.g. hourly from cron)
+    # python price_watch.py --run 12                                    (every ASIN of a product scrape)
+    parser = argparse.ArgumentParser(description="Check prices and stock of known ASINs and report what changed.")
+    parser.add_argument("asins", nargs="*", help="ASINs or product URLs")
+    parser.add_argument("--file", help="file with ASINs or product URLs, separated by new lines, spaces or commas")
+    parser.add_argument("--run", type=int, help="watch every product of this run (see `python store.py runs`)")
+    parser.add_argument("--out", help="append the changes to this JSON Lines file")
+    parser.add_argument("--concurrency", type=int, default=WATCH_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=Pacing.DEFAULTS["requests_per_second"],
+                        help="requests per second to the host")
+    args = parser.parse_args()
+
+    text = " ".join(args.asins)
+    if args.file:
+        with open(args.file, mode="r", encoding="utf-8") as asin_file:
+            text += " " + asin_file.read()
+    asins = parse_asins(text)
+    if args.run is not None:
+        with Store() as store:
+            asins += [asin for asin in store.run_asins(args.run) if asin not in asins]
+    if not asins:
+        parser.error("no ASINs given")
+
+    out_file = open(args.out, mode="a", encoding="utf-8") if args.out else None
+
+    def report(change):
+        print(describe(change))
+        if out_file:
+            out_file.write(json.dumps(change, ensure_ascii=False) + "\n")
+
+    try:
+        changes, failed = watch_prices(asins, args.concurrency,
+                                       Pacing(requests_per_second=args.rate, burst=max(4, int(args.rate * 2))),
+                                       on_change=report)
+    finally:
+        if out_file:
+            out_file.close()
+    if failed:
+        print(f"⚠️ Could not check {len(failed)} ASINs: {' '.join(failed[:20])}", file=sys.stderr)
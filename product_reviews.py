@@ -1,194 +1,437 @@
-from flask import Flask, render_template, request, send_file
+from flask import Flask, render_template, request, jsonify, Response
 import os
-import re
-import time
 import json
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 
-app = Flask(__name__)
+from extractor import extract_review_page, build_review, site_context, RULES
+from fetcher import Fetcher
+from pacing import Pacing
+from output import job_key, claim_job, release_job, open_job, write_json_array
+from export import ExportError, send_export
+from store import Store
+from urls import parse_asins
+from metrics import Metrics, REGISTRY, bind_job, span, incr, instrument_driver
+from browser import apply_profile, prepare_driver, reset_page_metrics, page_metrics, PageStats, DriverPool, chromedriver_path
+from jobs import JobManager, QueueFullError, JOBS_DIR
 
-from datetime import datetime
+app = Flask(__name__)
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 filename = os.path.join(BASE_DIR, "amazon_reviews.json")
 
-def init_driver(user_id):
-    user_profile_path = os.path.join(BASE_DIR, f"user_profiles/{user_id}")
+REVIEWS_URL = "https://www.amazon.in/product-reviews/{asin}/ref=cm_cr_dp_d_show_all_btm?ie=UTF8&reviewerType=all_reviews"
+# Review pages of one ASIN fetched at once over plain HTTP; the next batch of pages
+# is only requested when these didn't reach the last page
+HTTP_CONCURRENCY = 4
+# Upper bound on review pages requested at once from the host across a whole batch of ASINs
+MAX_CONCURRENCY_PER_HOST = 8
+# ASINs scraped side by side in a batch job
+BATCH_WORKERS = 4
+# Longest the browser waits on the first review page for a manual login
+LOGIN_WAIT = 35
+# Driver profile for review pages; "full" keeps a visible window for the manual login (see browser.py)
+REVIEW_PROFILE = "full"
+# Review browsers kept warm between jobs
+DRIVER_POOL_SIZE = 2
+# Chrome profiles of the review browsers, one per pool slot, so a manual login survives between jobs
+PROFILES_DIR = os.path.join(BASE_DIR, "user_profiles")
+# Processes running side by side (frontier workers) each set their own name here:
+# Chrome won't start on a profile another Chrome already has open
+profile_set = None
+
+def profile_path(slot):
+    """Chrome profile directory of a pool slot. Under a ``profile_set`` it starts
+    as a copy of the slot's login profile (delete it to copy the login again)."""
+    login_path = os.path.join(PROFILES_DIR, f"pool_{slot}")
+    if profile_set is None:
+        return login_path
+    path = os.path.join(PROFILES_DIR, profile_set, f"pool_{slot}")
+    if not os.path.exists(path) and os.path.isdir(login_path):
+        # Without the lock files of a Chrome that may have the login profile open
+        shutil.copytree(login_path, path, ignore=shutil.ignore_patterns("Singleton*", "lockfile", "*.lock"))
+    return path
+
+
+def init_driver(slot, profile="full"):
+    user_profile_path = profile_path(slot)
     os.makedirs(user_profile_path, exist_ok=True)  # ensure the folder exists
 
     options = webdriver.ChromeOptions()
     options.add_argument(f"--user-data-dir={user_profile_path}")
-    options.add_argument("--start-maximized")
+    apply_profile(options, profile)
     options.add_argument('--disable-blink-features=AutomationControlled')
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
 
-    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    driver = webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+    instrument_driver(driver)
+    prepare_driver(driver, profile)
+    return driver
+
+
+# Warm review browsers; cookies are kept between leases because they hold the login
+driver_pool = DriverPool(lambda slot: init_driver(slot, REVIEW_PROFILE), DRIVER_POOL_SIZE, clear_cookies=False)
+
+
+# Raw text of every review on the page, gathered in a single WebDriver round-trip.
+# innerText matches what WebElement.text returns; the rating uses textContent
+# because its "x out of 5 stars" label is visually hidden.
+BATCHED_REVIEWS_JS = """
+const text = el => el ? el.innerText.trim() : null;
+return Array.from(document.querySelectorAll(".review"), r => {
+    const body = r.querySelector("span[data-hook='review-body']");
+    const rating = r.querySelector("i[data-hook='review-star-rating'], i[data-hook='cmps-review-star-rating']");
+    return {
+        date: text(r.querySelector("span[data-hook='review-date']")),
+        rating: rating ? rating.textContent : null,
+        title: text(r.querySelector(".a-size-base.a-link-normal.review-title.a-color-base.review-title-content.a-text-bold")),
+        body: text(body),
+        body_spans: body ? Array.from(body.querySelectorAll("span"), text) : [],
+        candidates: Array.from(r.querySelectorAll("div.a-row, span"))
+            .filter(c => !(c.classList.contains("a-profile-name") || c.closest(".a-profile-content")))
+            .map(text),
+    };
+});
+"""
+
+
+def review_page_url(asin, page):
+    url = REVIEWS_URL.format(asin=asin)
+    return url if page == 1 else f"{url}&pageNumber={page}"
+
+
+def review_key(review):
+    return review["Review_Date"], review["Review_Title"], review["Review_Body"]
+
+
+def is_repeat_page(reviews, seen):
+    """True when every review on the page was already on an earlier one (Amazon
+    serves the last page again for page numbers past the end)."""
+    keys = [review_key(review) for review in reviews]
+    if all(key in seen for key in keys):
+        return True
+    seen.update(keys)
+    return False
+
+
+def fetch_reviews_over_http(fetcher, asin, max_pages, writer, checkpoint, store, run_id, progress=None):
+    """Fetch the remaining review pages over plain HTTP, ``fetcher.concurrency``
+    pages at a time, and stream their reviews to ``writer``. Stops at the last
+    page, an empty page or a page repeating earlier reviews. Returns False when
+    a page is blocked or the first page has no reviews, leaving the checkpoint
+    on the page the browser has to take over."""
+    seen = set()
+    first_page = checkpoint.page
+    while first_page <= max_pages:
+        pages = range(first_page, min(first_page + fetcher.concurrency, max_pages + 1))
+        with span("fetch"):
+            results = fetcher.fetch_all([review_page_url(asin, page) for page in pages])
+
+        for page, result in zip(pages, results):
+            if not result.ok:
+                print(f"🌐 Review page {page} needs the browser (status {result.status}, error {result.error})")
+                return False
+            with span("extract"):
+                reviews, has_next = extract_review_page(result.html, result.url)
+            if not reviews:
+                if page == 1:
+                    return False
+                print("No more pages.")
+                return True
+            if is_repeat_page(reviews, seen):
+                print(f"🔁 Review page {page} repeats earlier reviews, stopping")
+                return True
+
+            with span("write"):
+                checkpoint.start_page(page, records=writer.count)
+                store.add_reviews(run_id, asin, enumerate(reviews, start=writer.count))
+                for review in reviews:
+                    writer.write(review)
+            incr("scraper_reviews_total", amount=len(reviews), source="http")
+            print(f"⚡ Fetched review page {page} over HTTP ({len(reviews)} reviews)")
+            checkpoint.start_page(page + 1, records=writer.count)
+            if progress:
+                progress(page, writer.count)
+            if not has_next:
+                return True
+
+        first_page = pages[-1] + 1
+    return True
+
+
+def reviews_present(driver):
+    return driver.find_elements(By.CSS_SELECTOR, ".review")
+
+
+def review_page_loaded(driver):
+    # The review list container is there even on a page past the last one
+    return driver.find_elements(By.CSS_SELECTOR, ".review, #cm_cr-review_list")
+
+
+def scrape_reviews(asin, max_pages, http_first=True, pacing=None, output_path=filename, progress=None, job_metrics=None,
+                   concurrency=HTTP_CONCURRENCY, wait=False):
+    pacing = pacing or Pacing(login_wait=LOGIN_WAIT)
+    # Stage timings and counters for this job, on top of the process-wide /metrics
+    job_metrics = job_metrics or Metrics()
+    bind_job(job_metrics)
+
+    # Reviews stream to output/<job>.jsonl; a rerun with the same parameters picks up from the checkpoint
+    key = job_key("reviews", asin, max_pages)
+    # A batch that shares an ASIN with a running job waits for it instead of writing the same checkpoint
+    claim_job(key, wait=wait)
+    try:
+        writer, checkpoint = open_job(key)
+        # Every review also lands in the results database, which the JSON download is exported from
+        store = Store()
+        run_id = store.start_run("reviews", key, resume=checkpoint.resumed, keep=writer.count)
+        try:
+            if http_first:
+                fetcher = Fetcher(concurrency=concurrency, per_host=concurrency, pacing=pacing)
+                if fetch_reviews_over_http(fetcher, asin, max_pages, writer, checkpoint, store, run_id, progress):
+                    checkpoint.finish()
+                    return output_path
+
+            scrape_reviews_in_browser(asin, max_pages, pacing, writer, checkpoint, store, run_id, progress)
+        finally:
+            writer.close()
+            if checkpoint.finished:
+                store.finish_run(run_id)
+            with span("write"):
+                store.export_json(run_id, output_path, kind="reviews")
+            store.close()
+            RULES.save_stats()
+            print(f"⏱️ Job stages: {job_metrics.summary()['stages']}")
+    finally:
+        release_job(key)
 
+    return output_path
 
-def scrape_reviews(asin, max_pages,user_id):
-    driver = init_driver(user_id)
-    all_reviews = []
 
-    try:
-        url = f"https://www.amazon.in/product-reviews/{asin}/ref=cm_cr_dp_d_show_all_btm?ie=UTF8&reviewerType=all_reviews"
-        driver.get(url)
-        print("Waiting for login if needed...")
-        time.sleep(35)  # Time for manual login if required
-
-        page = 1
-        while page <= max_pages:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-
-            wait = WebDriverWait(driver, 10)
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".review")))
-            reviews = driver.find_elements(By.CSS_SELECTOR, ".review")
-
-            for r in reviews:
-                try:
-                    driver.execute_script("arguments[0].scrollIntoView(true);", r)
-                    time.sleep(0.1)
-
-                    #Extract Review Date
-                    try:
-                        date_element = r.find_element(By.CSS_SELECTOR, "span[data-hook='review-date']")
-                        raw_date_text = date_element.text.strip()
-                        # Extract the part after "on" (e.g., "18 May 2025")
-                        date_part = raw_date_text.split("on")[-1].strip()
-                        # Parse it and format as dd/mm/yyyy
-                        parsed_date = datetime.strptime(date_part, "%d %B %Y")
-                        date = parsed_date.strftime("%d/%m/%Y")
-                    except:
-                        date = "N/A"
-
-                    # Extract Rating
-                    try:
-                        rating_element = r.find_element(By.CSS_SELECTOR, "i[data-hook='review-star-rating'], i[data-hook='cmps-review-star-rating']")
-                        rating_text = rating_element.get_attribute('textContent').strip()
-                        rating_match = re.search(r"(\d+\.?\d*) out of 5", rating_text)
-                        rating = rating_match.group(1) if rating_match else "N/A"
-                    except:
-                        rating = "N/A"
-
-                    # Extract Review Title
-                    try:
-                        title = r.find_element(By.CSS_SELECTOR, ".a-size-base.a-link-normal.review-title.a-color-base.review-title-content.a-text-bold").text.strip()
-                    except:
-                        title = "N/A"
-
-                    # Extract Review Body
-                    try:
-                        body = "N/A"
-                        try:
-                            review_body_container = r.find_element(By.CSS_SELECTOR, "span[data-hook='review-body']")
-                            direct_text = review_body_container.text.strip()
-                            if direct_text:
-                                body = direct_text
-                            else:
-                                span_children = review_body_container.find_elements(By.TAG_NAME, "span")
-                                for s in span_children:
-                                    text = s.text.strip()
-                                    if text:
-                                        body = text
-                                        break
-                        except:
-                            pass
-
-                        if body == "N/A":
-                            try:
-                                username_element = None
-                                try:
-                                    username_element = r.find_element(By.CSS_SELECTOR, "span.a-profile-name")
-                                except:
-                                    pass
-
-                                candidates = r.find_elements(By.CSS_SELECTOR, "div.a-row, span")
-                                for c in candidates:
-                                    if username_element and username_element.is_displayed():
-                                        if c == username_element or c.find_elements(By.XPATH, ".//ancestor-or-self::*[contains(@class, 'a-profile-content')]"):
-                                            continue
-                                    text = c.text.strip()
-                                    if text and not any(kw in text.lower() for kw in ["reviewed in", "verified purchase", "report", "helpful", "video", "click", "reader", "customer"]):
-                                        body = text
-                                        break
-                            except:
-                                pass
-                    except:
-                        body = "N/A"
-
-                    if body != "N/A":
-                        body = body.replace("Click to play video", "").strip()
-                        if not body:
-                            body = "N/A"
-
-                    all_reviews.append({
-                        "Review_Date": date,
-                        "User_Rating_out_of_5": rating,
-                        "Review_Title": title,
-                        "Review_Body": body
-                    })
-                except:
-                    continue
+def scrape_reviews_in_browser(asin, max_pages, pacing, writer, checkpoint, store, run_id, progress=None):
+    """Load the remaining review pages by URL in a pooled browser, with the
+    same stopping rules as the HTTP path."""
+    driver = driver_pool.acquire()
+    broken = False
+    page_stats = PageStats(REVIEW_PROFILE)
+    seen = set()
 
-            try:
-                next_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "li.a-last a")))
-                driver.execute_script("arguments[0].click();", next_button)
-                page += 1
-                time.sleep(3)
+    try:
+        first_page = checkpoint.page
+        for page in range(first_page, max_pages + 1):
+            checkpoint.start_page(page, records=writer.count)
+            if progress:
+                progress(page - 1, writer.count)
+
+            url = review_page_url(asin, page)
+            with span("wait"):
+                pacing.wait_turn(url)
+            with span("navigate"):
+                driver.get(url)
+            if page == first_page:
+                print("Waiting for login if needed...")
+                with span("wait"):
+                    pacing.wait_for_login(driver, reviews_present)  # Returns as soon as the reviews show up
+            with span("scroll"):
                 driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
-            except:
+            with span("wait"):
+                pacing.wait_for(driver, review_page_loaded)
+            page_stats.record(*page_metrics(driver))
+            reset_page_metrics(driver)
+
+            # Every review on the page comes back from one script call; the parsing rules run in Python
+            with span("extract"):
+                page_reviews = [build_review(raw_review, site_context(url))
+                                for raw_review in driver.execute_script(BATCHED_REVIEWS_JS)]
+            if not page_reviews:
+                print("No more pages.")
+                break
+            if is_repeat_page(page_reviews, seen):
+                print(f"🔁 Review page {page} repeats earlier reviews, stopping")
+                break
+
+            with span("write"):
+                store.add_reviews(run_id, asin, enumerate(page_reviews, start=writer.count))
+                for review in page_reviews:
+                    writer.write(review)
+            incr("scraper_reviews_total", amount=len(page_reviews), source="browser")
+            if progress:
+                progress(page, writer.count)
+
+            # The last page has no next link, so there's no need to load one past it
+            if not driver.find_elements(By.CSS_SELECTOR, "li.a-last a"):
                 print("No more pages or next button not found.")
                 break
+        checkpoint.finish()
+    except Exception:
+        broken = not driver_pool.is_healthy(driver)
+        raise
     finally:
-        driver.quit()
-        with open(filename, mode="w", encoding="utf-8") as output_file:
-            json.dump(all_reviews, output_file, ensure_ascii=False, indent=4)
+        driver_pool.release(driver, broken)
+        print(f"📊 Browser pages: {page_stats.summary()}")
+
+
+def scrape_reviews_batch(asins, max_pages, workers=BATCH_WORKERS, http_first=True, pacing=None, output_path=filename,
+                         progress=None, job_metrics=None):
+    """Scrape the reviews of several ASINs side by side into one JSON file, each
+    review tagged with its ASIN. Every ASIN is its own resumable run; the pacing
+    is shared so the per-host rate limit holds across the whole batch."""
+    pacing = pacing or Pacing(login_wait=LOGIN_WAIT)
+    job_metrics = job_metrics or Metrics()
+    workers = max(1, min(workers, len(asins)))
+    # Split the host's connection budget between the workers
+    concurrency = max(1, min(HTTP_CONCURRENCY, MAX_CONCURRENCY_PER_HOST // workers))
+
+    done = {}
+    done_lock = threading.Lock()
+
+    def asin_progress(asin):
+        def report(pages_done, items_done):
+            with done_lock:
+                done[asin] = (pages_done, items_done)
+                totals = [sum(counts) for counts in zip(*done.values())]
+            if progress:
+                progress(*totals)
+        return report
+
+    with tempfile.TemporaryDirectory(prefix="reviews-batch-") as workdir:
+        def scrape_one(asin):
+            asin_path = os.path.join(workdir, f"{asin}.json")
+            try:
+                scrape_reviews(asin, max_pages, http_first, pacing, asin_path, asin_progress(asin), job_metrics,
+                               concurrency, wait=True)
+            except Exception as e:
+                # A rerun resumes this ASIN from its checkpoint
+                incr("scraper_review_errors_total", error=type(e).__name__)
+                print(f"❌ Error scraping reviews for {asin}: {e}")
+            return asin_path
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="review-worker") as executor:
+            asin_paths = list(executor.map(scrape_one, asins))
+
+        def tagged_reviews():
+            for asin, asin_path in zip(asins, asin_paths):
+                if not os.path.exists(asin_path):
+                    continue
+                with open(asin_path, mode="r", encoding="utf-8") as asin_file:
+                    for review in json.load(asin_file):
+                        yield {"ASIN": asin, **review}
+
+        write_json_array(tagged_reviews(), output_path)
+    print(f"📚 Reviews for {len(asins)} products written to {output_path}")
+    return output_path
+
+
+def run_job(job):
+    asins = job.params["asins"]
+    pacing = Pacing(**{"login_wait": LOGIN_WAIT, **job.params.get("pacing", {})})
+    if len(asins) == 1:
+        scrape_reviews(
+            asins[0], job.params["pages"], pacing=pacing,
+            output_path=job.output_path, progress=job.progress, job_metrics=job.metrics,
+        )
+    else:
+        scrape_reviews_batch(
+            asins, job.params["pages"], pacing=pacing,
+            output_path=job.output_path, progress=job.progress, job_metrics=job.metrics,
+        )
+
+
+jobs = JobManager("reviews", run_job, "amazon_reviews")
+
+
+def wants_json():
+    return request.accept_mimetypes.best_match(["application/json", "text/html"]) == "application/json"
+
+
+def form_error(message):
+    if wants_json():
+        return jsonify({"error": message}), 400
+    return render_template("index.html", error=message)
 
-    return filename
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
-        product_url = request.form.get('product_url')
+        product_url = request.form.get('product_url', '')
         pages = int(request.form.get('pages', 1))
+        products_run = request.form.get('products_run')
 
-        if not product_url:
-            return render_template("index.html", error="Please enter a valid product URL")
-
-        asin_match = re.search(r"/([A-Z0-9]{10})(?:[/?]|$)", product_url)
-        if asin_match:
-            asin = asin_match.group(1)
+        # One or more product URLs/ASINs, or every product of an earlier product scrape (see `python store.py runs`)
+        if products_run:
+            with Store() as store:
+                asins = store.run_asins(int(products_run))
         else:
+            asins = parse_asins(product_url)
+
+        if not product_url and not products_run:
+            return render_template("index.html", error="Please enter a valid product URL")
+        if not asins:
             return render_template("index.html", error="Invalid Amazon product URL")
+        try:
+            # Per-job overrides of any of Pacing.DEFAULTS
+            pacing_settings = Pacing.parse_settings(request.form)
+        except ValueError as e:
+            return form_error(str(e))
 
         try:
-            user_id = request.remote_addr.replace(".", "_")  # Create a user-specific ID based on IP
-            json_filename = scrape_reviews(asin, pages, user_id)
+            # The scrape runs in the background; the page polls the job until its file is ready
+            job = jobs.submit(asins=asins, pages=pages, pacing=pacing_settings)
+        except QueueFullError as e:
+            if wants_json():
+                return jsonify({"error": str(e)}), 503
+            return render_template("index.html", error=str(e))
 
-            # Only render page with download button
-            return render_template("index.html", download_ready=True, filename=os.path.basename(json_filename))
-        except Exception as e:
-            return render_template("index.html", error=f"An error occurred: {str(e)}")
+        if wants_json():
+            return jsonify(job.to_dict()), 202
+        return render_template("index.html", job_id=job.id)
 
     return render_template("index.html")
 
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/progress')
+def job_progress(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"status": job.status, "pages_done": job.pages_done, "items_done": job.items_done})
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route('/download/<filename>')
 def download_file(filename):
-    path = os.path.join(BASE_DIR, filename)
-    if os.path.exists(path):
-        return send_file(path, as_attachment=True)
-    else:
-        return "File not found", 404
+    filename = os.path.basename(filename)
+    for directory in (JOBS_DIR, BASE_DIR):
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            try:
+                # ?format=jsonl.gz, csv or parquet converts the JSON output on first request
+                return send_export(path, request.args.get('format', 'json'))
+            except ExportError as e:
+                return str(e), 400
+    return "File not found", 404
 
 
 if __name__ == "__main__":
+    # Start a browser ahead of the first job (only in the process that serves requests)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        driver_pool.warm(1)
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import time
+
+from urls import canonical_product_url, extract_asin
+from metrics import incr
+
+
+# Products an earlier run scraped within this many hours are skipped; 0 scrapes them again
+FRESH_HOURS = 0
+
+# Why a product link was not opened
+SKIP_REASONS = ("duplicate", "seen", "fresh")
+
+
+def asin_key(asin):
+    # An ASIN is 10 base-36 digits: as an int it takes about half the memory of the str
+    return int(asin, 36)
+
+
+class SeenProducts:
+    """Decides which product links of a search page are worth opening.
+
+    Links are reduced to their canonical ``/dp/ASIN`` URL first, so sponsored
+    redirects, variant links and repeated cards collapse into one product.
+    Then products this job already scraped on an earlier page (kept in memory
+    as ASINs, and reloaded from the store's run when a job resumes) and, with
+    ``fresh_hours``, products an earlier run scraped that recently are skipped.
+    """
+
+    def __init__(self, store=None, run_id=None, fresh_hours=FRESH_HOURS):
+        self.store = store
+        self.fresh_for = fresh_hours * 60 * 60
+        self.keys = set()
+        self.skipped = dict.fromkeys(SKIP_REASONS, 0)
+        if store is not None and run_id is not None:
+            for asin in store.run_asins(run_id):
+                self.add(asin)
+
+    def add(self, asin):
+        if asin:
+            self.keys.add(asin_key(asin))
+
+    def __contains__(self, asin):
+        return bool(asin) and asin_key(asin) in self.keys
+
+    def filter(self, urls):
+        """Canonical URLs of ``urls`` still to scrape, in page order, and the
+        number skipped for each of SKIP_REASONS."""
+        canonical = {}
+        skipped = dict.fromkeys(SKIP_REASONS, 0)
+        for url in urls:
+            url = canonical_product_url(url)
+            if url in canonical:
+                skipped["duplicate"] += 1
+            else:
+                canonical[url] = extract_asin(url)
+
+        fresh = set()
+        if self.fresh_for and self.store is not None:
+            fresh = self.store.scraped_since([asin for asin in canonical.values() if asin], time.time() - self.fresh_for)
+
+        pending = []
+        for url, asin in canonical.items():
+            if asin in self:
+                skipped["seen"] += 1
+            elif asin in fresh:
+                skipped["fresh"] += 1
+            else:
+                pending.append(url)
+
+        for reason, count in skipped.items():
+            if count:
+                self.skipped[reason] += count
+                incr("scraper_products_skipped_total", count, reason=reason)
+        return pending, skipped
+
+
+def describe_skips(skipped):
+    parts = {"duplicate": "repeated links", "seen": "already scraped in this job", "fresh": "scraped recently"}
+    return ", ".join(f"{count} {parts[reason]}" for reason, count in skipped.items() if count)
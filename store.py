@@ -0,0 +1,376 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+
+from extractor import parse_price, split_product_info
+from output import write_json_array
+from urls import extract_asin
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "scraper.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    job_key TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS runs_job_key ON runs (job_key, started_at);
+
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    position INTEGER NOT NULL,
+    asin TEXT,
+    url TEXT,
+    scraped_at REAL NOT NULL,
+    title TEXT,
+    price REAL,
+    rating REAL,
+    record TEXT NOT NULL,
+    UNIQUE (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS products_asin ON products (asin, scraped_at);
+CREATE INDEX IF NOT EXISTS products_price ON products (price);
+CREATE INDEX IF NOT EXISTS products_rating ON products (rating);
+CREATE INDEX IF NOT EXISTS products_scraped_at ON products (scraped_at);
+
+CREATE TABLE IF NOT EXISTS product_info (
+    product_id INTEGER NOT NULL REFERENCES products (id),
+    key TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS product_info_product ON product_info (product_id);
+CREATE INDEX IF NOT EXISTS product_info_key ON product_info (key, value);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    position INTEGER NOT NULL,
+    asin TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    review_date TEXT,
+    rating REAL,
+    title TEXT,
+    body TEXT,
+    record TEXT NOT NULL,
+    UNIQUE (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS reviews_asin ON reviews (asin, scraped_at);
+CREATE INDEX IF NOT EXISTS reviews_rating ON reviews (rating);
+CREATE INDEX IF NOT EXISTS reviews_date ON reviews (review_date);
+
+CREATE TABLE IF NOT EXISTS prices (
+    id INTEGER PRIMARY KEY,
+    asin TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    price REAL,
+    availability TEXT
+);
+CREATE INDEX IF NOT EXISTS prices_asin ON prices (asin, checked_at);
+CREATE INDEX IF NOT EXISTS prices_checked_at ON prices (checked_at);
+"""
+
+TABLES = {"products": "products", "reviews": "reviews"}
+
+
+def iso_date(review_date):
+    # "18/05/2025" -> "2025-05-18", so dates sort and compare as text
+    try:
+        return datetime.strptime(review_date, "%d/%m/%Y").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rating(rating_text):
+    rating_match = re.match(r"\s*(\d+(?:\.\d+)?)", rating_text or "")
+    return float(rating_match.group(1)) if rating_match else None
+
+
+class Store:
+    """Every scraped product and review, kept across runs in SQLite.
+
+    A run is one scrape job; its rows are numbered by ``position`` in output
+    order, so the JSON download is an export of one run and a resumed job
+    keeps writing into the run it started. Writes for a batch of records go
+    in a single transaction.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DB_PATH
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        # WAL lets the Flask apps read while a job writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        # Keeps the planner's statistics current as the tables grow
+        self.conn.execute("PRAGMA optimize")
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start_run(self, kind, job_key, resume=False, keep=0):
+        """Id of the run to write to. A resumed job gets its unfinished run back,
+        cut down to the first ``keep`` records like its JSONL output."""
+        with self.conn:
+            if resume:
+                row = self.conn.execute(
+                    "SELECT id FROM runs WHERE job_key = ? AND finished_at IS NULL ORDER BY started_at DESC LIMIT 1",
+                    (job_key,),
+                ).fetchone()
+                if row:
+                    run_id = row[0]
+                    self.conn.execute(
+                        "DELETE FROM product_info WHERE product_id IN "
+                        "(SELECT id FROM products WHERE run_id = ? AND position >= ?)", (run_id, keep))
+                    self.conn.execute("DELETE FROM products WHERE run_id = ? AND position >= ?", (run_id, keep))
+                    self.conn.execute("DELETE FROM reviews WHERE run_id = ? AND position >= ?", (run_id, keep))
+                    return run_id
+
+            cursor = self.conn.execute(
+                "INSERT INTO runs (kind, job_key, started_at) VALUES (?, ?, ?)", (kind, job_key, time.time()))
+            return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        with self.conn:
+            self.conn.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), run_id))
+
+    def add_products(self, run_id, rows):
+        """Upsert ``(position, url, record)`` rows into a run, in one transaction."""
+        scraped_at = time.time()
+        with self.conn:
+            for position, url, record in rows:
+                info = split_product_info(record.get("Product_Information"))
+                info_values = dict(info)
+                # Old JSON files have no URL, but the product details usually list the ASIN
+                asin = (extract_asin(url) if url else None) or info_values.get("ASIN")
+
+                self.conn.execute(
+                    "DELETE FROM product_info WHERE product_id IN "
+                    "(SELECT id FROM products WHERE run_id = ? AND position = ?)", (run_id, position))
+                cursor = self.conn.execute(
+                    "INSERT OR REPLACE INTO products (run_id, position, asin, url, scraped_at, title, price, rating, record) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, position, asin, url, scraped_at, record.get("Title"), parse_price(record.get("Price")),
+                     parse_rating(info_values.get("Customer Reviews") or record.get("Rating")), json.dumps(record, ensure_ascii=False)),
+                )
+                self.conn.executemany(
+                    "INSERT INTO product_info (product_id, key, value) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, key, value) for key, value in info],
+                )
+
+    def add_reviews(self, run_id, asin, rows):
+        """Upsert ``(position, record)`` review rows for ``asin`` into a run, in one transaction."""
+        scraped_at = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO reviews (run_id, position, asin, scraped_at, review_date, rating, title, body, record) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, position, asin, scraped_at, iso_date(record.get("Review_Date")),
+                  parse_rating(record.get("User_Rating_out_of_5")), record.get("Review_Title"),
+                  record.get("Review_Body"), json.dumps(record, ensure_ascii=False))
+                 for position, record in rows],
+            )
+
+    def run_records(self, run_id, kind="products"):
+        """A run's records in output order, read lazily."""
+        cursor = self.conn.execute(f"SELECT record FROM {TABLES[kind]} WHERE run_id = ? ORDER BY position", (run_id,))
+        for (record,) in cursor:
+            yield json.loads(record)
+
+    def export_json(self, run_id, json_path, kind="products"):
+        return write_json_array(self.run_records(run_id, kind), json_path)
+
+    def run_asins(self, run_id):
+        """ASINs of a products run in output order, each once."""
+        rows = self.conn.execute(
+            "SELECT asin FROM products WHERE run_id = ? AND asin IS NOT NULL ORDER BY position", (run_id,))
+        return list(dict.fromkeys(asin for (asin,) in rows))
+
+    def recent_runs(self, limit=20):
+        return self.conn.execute(
+            "SELECT r.id, r.kind, r.started_at, r.finished_at, "
+            "(SELECT COUNT(*) FROM products WHERE run_id = r.id) + (SELECT COUNT(*) FROM reviews WHERE run_id = r.id) "
+            "FROM runs AS r ORDER BY r.id DESC LIMIT ?", (limit,)).fetchall()
+
+    def price_history(self, asin):
+        """Prices from full product scrapes and from the price watch, oldest first."""
+        return self.conn.execute(
+            "SELECT scraped_at, price FROM products WHERE asin = ? "
+            "UNION ALL SELECT checked_at, price FROM prices WHERE asin = ? ORDER BY 1", (asin, asin)).fetchall()
+
+    def known_asins(self, asins):
+        """Which of ``asins`` an earlier scrape (or this one) already saved."""
+        known = set()
+        asins = list(asins)
+        for start in range(0, len(asins), 500):
+            chunk = asins[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT DISTINCT asin FROM products WHERE asin IN ({', '.join('?' * len(chunk))})", chunk)
+            known.update(asin for (asin,) in rows)
+        return known
+
+    def scraped_since(self, asins, since):
+        """Which of ``asins`` a products run saved at or after the ``since`` timestamp."""
+        fresh = set()
+        asins = list(asins)
+        for start in range(0, len(asins), 500):
+            chunk = asins[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT DISTINCT asin FROM products WHERE asin IN ({', '.join('?' * len(chunk))}) AND scraped_at >= ?",
+                [*chunk, since])
+            fresh.update(asin for (asin,) in rows)
+        return fresh
+
+    def last_prices(self, asins):
+        """Latest known ``(price, availability)`` of each ASIN, from whichever of the
+        price watch and full product scrapes saw it last (full scrapes don't
+        record availability). ASINs never seen are left out."""
+        snapshots = {}
+        asins = list(asins)
+        # Chunked to stay under SQLite's bound parameter limit
+        for start in range(0, len(asins), 500):
+            chunk = asins[start:start + 500]
+            marks = ", ".join("?" * len(chunk))
+            # SQLite takes the bare columns from the row holding the MAX()
+            for asin, price, availability, checked_at in self.conn.execute(
+                    f"SELECT asin, price, availability, MAX(checked_at) FROM prices WHERE asin IN ({marks}) GROUP BY asin",
+                    chunk):
+                snapshots[asin] = (price, availability, checked_at)
+            for asin, price, scraped_at in self.conn.execute(
+                    f"SELECT asin, price, MAX(scraped_at) FROM products WHERE asin IN ({marks}) GROUP BY asin", chunk):
+                watched = snapshots.get(asin)
+                if watched is None or scraped_at > watched[2]:
+                    snapshots[asin] = (price, watched[1] if watched else None, scraped_at)
+        return {asin: (price, availability) for asin, (price, availability, _) in snapshots.items()}
+
+    def add_prices(self, rows):
+        """Record ``(asin, checked_at, price, availability)`` price watch observations, in one transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO prices (asin, checked_at, price, availability) VALUES (?, ?, ?, ?)", rows)
+
+    def latest_products(self, max_price=None):
+        """The most recent scrape of every ASIN, optionally only those priced at most ``max_price``."""
+        query = (
+            "SELECT p.asin, p.title, p.price, p.rating, p.scraped_at FROM products AS p "
+            "JOIN (SELECT asin, MAX(scraped_at) AS scraped_at FROM products WHERE asin IS NOT NULL GROUP BY asin) "
+            "AS latest ON latest.asin = p.asin AND latest.scraped_at = p.scraped_at"
+        )
+        if max_price is None:
+            return self.conn.execute(query).fetchall()
+        return self.conn.execute(query + " WHERE p.price <= ?", (max_price,)).fetchall()
+
+    def dropped_below(self, threshold, since):
+        """ASINs whose price crossed under ``threshold`` since ``since`` (epoch
+        seconds): a price under it whose previous known price, from a full
+        scrape or the price watch, was at or above it. Returns
+        (asin, title, price, seen_at, was), one row per ASIN with its latest drop."""
+        # Only ASINs seen in the window (scraped_at/checked_at indexes) get their history walked,
+        # in the same union of both tables that price_history() reads
+        rows = self.conn.execute(
+            "WITH recent AS ("
+            " SELECT asin FROM products WHERE scraped_at >= ? UNION SELECT asin FROM prices WHERE checked_at >= ?), "
+            "history AS ("
+            " SELECT asin, scraped_at AS seen_at, price FROM products "
+            " WHERE asin IN recent AND price IS NOT NULL "
+            " UNION ALL SELECT asin, checked_at, price FROM prices WHERE asin IN recent AND price IS NOT NULL), "
+            "steps AS ("
+            " SELECT asin, seen_at, price, LAG(price) OVER (PARTITION BY asin ORDER BY seen_at) AS was FROM history) "
+            "SELECT asin, (SELECT title FROM products WHERE products.asin = steps.asin ORDER BY scraped_at DESC LIMIT 1), "
+            "price, seen_at, was FROM steps "
+            "WHERE seen_at >= ? AND price < ? AND was >= ? ORDER BY seen_at",
+            (since, since, since, threshold, threshold),
+        )
+        latest = {row[0]: row for row in rows}
+        return sorted(latest.values())
+
+    def reviews_for(self, asin, min_rating=None, since_date=None):
+        query = "SELECT review_date, rating, title, body FROM reviews WHERE asin = ?"
+        params = [asin]
+        if min_rating is not None:
+            query += " AND rating >= ?"
+            params.append(min_rating)
+        if since_date is not None:
+            query += " AND review_date >= ?"
+            params.append(since_date)
+        return self.conn.execute(query + " ORDER BY review_date DESC", params).fetchall()
+
+    def import_json(self, json_path, kind="products", asin=None):
+        """Load an earlier JSON download as a finished run of its own."""
+        with open(json_path, mode="r", encoding="utf-8") as json_file:
+            records = json.load(json_file)
+        run_id = self.start_run(kind, f"import:{os.path.abspath(json_path)}")
+        if kind == "reviews":
+            self.add_reviews(run_id, asin, enumerate(records))
+        else:
+            self.add_products(run_id, [(position, None, record) for position, record in enumerate(records)])
+        self.finish_run(run_id)
+        return run_id, len(records)
+
+
+if __name__ == "__main__":
+    # python store.py runs
+    # python store.py below 1500 --days 7
+    # python store.py import amazon_product_details.json
+    # python store.py export 12 products.json
+    # python store.py export 12 products.parquet
+    parser = argparse.ArgumentParser(description="Query and export the scraped results database.")
+    parser.add_argument("--db", default=None, help=f"database file (default {DB_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    below = commands.add_parser("below", help="ASINs whose price dropped below a threshold")
+    below.add_argument("price", type=float)
+    below.add_argument("--days", type=float, default=7)
+
+    commands.add_parser("runs", help="recent runs and how many records each holds")
+
+    history = commands.add_parser("history", help="price history of an ASIN")
+    history.add_argument("asin")
+
+    importer = commands.add_parser("import", help="load an earlier JSON download")
+    importer.add_argument("json_path")
+    importer.add_argument("--reviews-for", metavar="ASIN", help="the file holds reviews of this ASIN")
+
+    exporter = commands.add_parser("export", help="write a run as JSON, gzip'd JSON Lines, CSV or Parquet")
+    exporter.add_argument("run_id", type=int)
+    exporter.add_argument("json_path")
+    exporter.add_argument("--kind", choices=sorted(TABLES), default="products")
+
+    args = parser.parse_args()
+    with Store(args.db) as store:
+        if args.command == "below":
+            for asin, title, price, scraped_at, was in store.dropped_below(args.price, time.time() - args.days * 86400):
+                print(f"{asin}  {was:,.0f} -> {price:,.0f}  {datetime.fromtimestamp(scraped_at):%Y-%m-%d %H:%M}  {(title or '')[:60]}")
+        elif args.command == "runs":
+            for run_id, kind, started_at, finished_at, count in store.recent_runs():
+                status = "finished" if finished_at else "unfinished"
+                print(f"{run_id:>5}  {kind:<8}  {datetime.fromtimestamp(started_at):%Y-%m-%d %H:%M}  {status:<10}  {count} records")
+        elif args.command == "history":
+            for scraped_at, price in store.price_history(args.asin):
+                print(f"{datetime.fromtimestamp(scraped_at):%Y-%m-%d %H:%M}  {price if price is not None else 'N/A'}")
+        elif args.command == "import":
+            kind = "reviews" if args.reviews_for else "products"
+            run_id, count = store.import_json(args.json_path, kind, args.reviews_for)
+            print(f"📥 Imported {count} {kind} as run {run_id}")
+        else:
+            from export import ExportError, write_export
+            try:
+                # The format follows the file name: .json, .jsonl.gz, .csv or .parquet
+                write_export(lambda: store.run_records(args.run_id, args.kind), args.json_path)
+            except ExportError as e:
+                parser.error(str(e))
+            print(f"📤 Exported run {args.run_id} to {args.json_path}")
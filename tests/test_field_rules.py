@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extractor
+from field_rules import FieldRules
+
+
+PAGE = """<html><body>
+<span id="productTitle">Globe</span>
+<div id="productDetails_feature_div">
+  <table class="a-keyvalue prodDetTable">
+    <tr><th>Brand</th><td>Shifu</td></tr>
+    <tr><th>Weight</th><td>1 kg</td></tr>
+  </table>
+</div>
+</body></html>"""
+
+
+def test_earlier_misses_do_not_change_the_rule_order(tmp_path, monkeypatch):
+    rules = FieldRules(stats_path=str(tmp_path / "field_stats.json"))
+    monkeypatch.setattr(extractor, "RULES", rules)
+    url = "https://www.amazon.in/dp/B000000001"
+    before = extractor.extract_product(PAGE, url)["Product_Information"]
+
+    # Pages of this context mostly lacked the key/value table but had the details wrapper
+    context = extractor.site_context(url, "")
+    for rule in rules.fields["product", "Product_Information"][0]:
+        rules.stats[context, "Product_Information", rule.source] = [1000, 0 if rule.css_all else 1000]
+
+    assert extractor.extract_product(PAGE, url)["Product_Information"] == before == "Brand: Shifu\nWeight: 1 kg"
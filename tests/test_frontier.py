@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frontier import Frontier, SQLiteFrontier, product_task
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = SQLiteFrontier(str(tmp_path / "frontier.db"), max_attempts=2, retry_delay=0)
+    frontier.add("job", [product_task(f"B00000000{i}", f"https://www.amazon.in/dp/B00000000{i}") for i in range(2)])
+    yield frontier
+    frontier.close()
+
+
+def test_claim_hands_each_task_out_once(frontier):
+    assert len(frontier.claim("job", "a")) == 2
+    assert frontier.claim("job", "b") == []
+    assert frontier.counts("job") == {"product": {"leased": 2}}
+
+
+def test_adding_a_known_key_is_ignored(frontier):
+    assert frontier.add("job", [product_task("B000000000", "https://www.amazon.in/dp/B000000000")]) == 0
+
+
+def test_fail_leaves_completed_tasks_done(frontier):
+    first, second = frontier.claim("job", "a")
+    assert frontier.complete(first, "a", {"Title": "Globe"})
+    # A worker giving up on its whole batch must not requeue what it already finished
+    frontier.fail(first, "a", "blocked")
+    frontier.fail(second, "a", "blocked")
+    assert frontier.counts("job") == {"product": {"done": 1, "queued": 1}}
+    assert [result for _, result in frontier.results("job", "product")] == [{"Title": "Globe"}]
+
+
+def test_expired_lease_moves_to_another_worker(frontier):
+    tasks = frontier.claim("job", "a", lease_seconds=0)
+    reclaimed = frontier.claim("job", "b")
+    assert [task.id for task in reclaimed] == [task.id for task in tasks]
+    # The first worker lost its lease: its late result and failure are both ignored
+    assert not frontier.complete(tasks[0], "a", {"Title": "late"})
+    frontier.fail(tasks[1], "a", "timeout")
+    assert frontier.counts("job") == {"product": {"leased": 2}}
+    assert frontier.complete(reclaimed[0], "b", {"Title": "Globe"})
+
+
+def test_tasks_die_after_max_attempts(frontier):
+    for attempt in range(2):
+        for task in frontier.claim("job", "a"):
+            frontier.fail(task, "a", "blocked")
+    assert frontier.counts("job") == {"product": {"dead": 2}}
+    assert frontier.retry_dead("job") == 2
+    assert frontier.counts("job") == {"product": {"queued": 2}}
+
+
+def test_expired_lease_on_last_attempt_is_dead(frontier):
+    for attempt in range(2):
+        frontier.claim("job", "a", lease_seconds=0)
+    assert frontier.claim("job", "b") == []
+    assert frontier.counts("job") == {"product": {"dead": 2}}
+
+
+def test_backend_missing_a_method_fails_on_creation():
+    class PartialFrontier(Frontier):
+        def add(self, job, tasks):
+            return 0
+
+    with pytest.raises(TypeError, match="claim"):
+        PartialFrontier()
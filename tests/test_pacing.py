@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pacing import Pacing
+
+
+def test_parse_settings_keeps_given_values_as_numbers():
+    settings = Pacing.parse_settings({"requests_per_second": "0.5", "burst": "2", "login_wait": "", "pages": "3"})
+    assert settings == {"requests_per_second": 0.5, "burst": 2}
+    pacing = Pacing(**settings)
+    assert (pacing.requests_per_second, pacing.burst, pacing.login_wait) == (0.5, 2, 0)
+
+
+@pytest.mark.parametrize("values", [
+    {"requests_per_second": "0"},
+    {"requests_per_second": "fast"},
+    {"burst": "1.5"},
+    {"login_wait": "-1"},
+    {"ready_timeout": "nan"},
+    {"backoff_max": "inf"},
+])
+def test_parse_settings_rejects_bad_values(values):
+    with pytest.raises(ValueError, match=next(iter(values))):
+        Pacing.parse_settings(values)
@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import Store
+
+
+DAY = 24 * 60 * 60
+URL = "https://www.amazon.in/dp/B0BENCH001"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = Store(str(tmp_path / "scraper.db"))
+    yield store
+    store.close()
+
+
+def scrape(store, price, days_ago):
+    run_id = store.start_run("products", f"run-{price}-{days_ago}")
+    store.add_products(run_id, [(0, URL, {"Title": "Globe", "Price": f"{price:,}"})])
+    store.conn.execute("UPDATE products SET scraped_at = ? WHERE run_id = ?", (time.time() - days_ago * DAY, run_id))
+    store.conn.commit()
+
+
+def test_an_old_drop_is_not_reported_again(store):
+    scrape(store, 2000, 90)
+    scrape(store, 1400, 60)
+    scrape(store, 1400, 1)
+    assert store.dropped_below(1500, time.time() - 7 * DAY) == []
+
+
+def test_a_drop_compares_with_the_previous_price(store):
+    scrape(store, 2000, 90)
+    scrape(store, 1600, 30)
+    scrape(store, 1400, 1)
+    [(asin, title, price, seen_at, was)] = store.dropped_below(1500, time.time() - 7 * DAY)
+    assert (asin, title, price, was) == ("B0BENCH001", "Globe", 1400.0, 1600.0)
+
+
+def test_price_watch_observations_count(store):
+    scrape(store, 2000, 30)
+    store.add_prices([("B0BENCH001", time.time() - 3 * DAY, 1600.0, "In stock"),
+                      ("B0BENCH001", time.time() - 2 * DAY, 1400.0, "In stock")])
+    [(asin, title, price, seen_at, was)] = store.dropped_below(1500, time.time() - 7 * DAY)
+    assert (price, was) == (1400.0, 1600.0)
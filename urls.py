@@ -0,0 +1,55 @@
+import re
+from urllib.parse import parse_qs, unquote, urljoin, urlparse
+
+
+# Same pattern the review scraper has always used to pull the ASIN out of a product URL
+ASIN_PATTERN = re.compile(r"/([A-Z0-9]{10})(?:[/?]|$)")
+# Paths that name the product outright; tried first so other 10-character path segments can't win
+PRODUCT_PATH_PATTERN = re.compile(r"/(?:dp|gp/product|gp/aw/d|product-reviews)/([A-Z0-9]{10})(?:[/?]|$)")
+# Sponsored and tracking links (/sspa/click, /gp/slredirect/...) carry the product URL in one of these
+REDIRECT_PARAMS = ("url", "u", "redirectUrl")
+
+
+def clean_amazon_url(url):
+    return url.split('?')[0] if '?ref=' in url or '/ref=' in url else url
+
+
+def unwrap_redirect(url):
+    """The product URL a sponsored or tracking redirect link points to, else ``url`` itself."""
+    parsed = urlparse(url)
+    if "/sspa/click" not in parsed.path and "redirect" not in parsed.path.lower():
+        return url
+    query = parse_qs(parsed.query)
+    for param in REDIRECT_PARAMS:
+        if query.get(param):
+            # parse_qs decodes once; some links are encoded twice
+            return urljoin(url, unquote(query[param][0]))
+    return url
+
+
+def extract_asin(url):
+    path = urlparse(unwrap_redirect(url)).path
+    asin_match = PRODUCT_PATH_PATTERN.search(path) or ASIN_PATTERN.search(path)
+    return asin_match.group(1) if asin_match else None
+
+
+def canonical_product_url(url):
+    """``scheme://host/dp/ASIN`` for any link to a product page: sponsored
+    redirects, variant links and ref/tracking suffixes all end up the same URL.
+    Links without an ASIN come back unchanged."""
+    target = unwrap_redirect(url)
+    asin = extract_asin(target)
+    if asin is None:
+        return url
+    parsed = urlparse(target)
+    return f"{parsed.scheme}://{parsed.netloc}/dp/{asin}"
+
+
+def parse_asins(text):
+    """ASINs from product URLs or bare ASINs separated by spaces, commas or new lines, each once."""
+    asins = []
+    for token in re.split(r"[\s,]+", text or ""):
+        asin = extract_asin(token) or (token if re.fullmatch(r"[A-Z0-9]{10}", token) else None)
+        if asin and asin not in asins:
+            asins.append(asin)
+    return asins